@@ -1,18 +1,44 @@
 from __future__ import annotations
 
+import contextlib
+import ctypes
 import ipaddress
 import itertools
+import json
+import math
+import os
 import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
 import warnings
-from collections import defaultdict
-from collections.abc import Iterator
-from dataclasses import dataclass, field
-from typing import Any
+import weakref
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from functools import cached_property, wraps
+from typing import Any, NoReturn
 
 import pytest
 
+if sys.platform != "win32":
+    import fcntl
+
 _true_socket = socket.socket
+_true_socket_init = socket.socket.__init__
 _true_connect = socket.socket.connect
+_true_connect_ex = socket.socket.connect_ex
+_true_sendto = socket.socket.sendto
+# Not available on Windows.
+_true_sendmsg: Callable[..., int] | None = getattr(socket.socket, "sendmsg", None)
+# Set once asyncio event loops are first patched, as importing asyncio is
+# left to the tests.
+_true_loop_getaddrinfo: Any = None
+_true_bind = socket.socket.bind
 _true_getaddrinfo = socket.getaddrinfo
 _true_gethostbyname = socket.gethostbyname
 
@@ -23,11 +49,19 @@ class SocketBlockedError(RuntimeError):
     def __init__(
         self,
         msg: str = "A test tried to use socket.socket.",
+        origin: str | None = None,
         *_args: Any,
         **_kwargs: Any,
     ) -> None:
-        warnings.warn(msg, stacklevel=2)
+        self._msg = msg
+        self.origin = origin or _thread_origin()
+        if self.origin:
+            msg = f"{msg} (from {self.origin})"
         super().__init__(msg)
+        _warn_blocked(self, self._msg)
+
+    def __reduce__(self) -> tuple[Any, tuple[Any, ...]]:
+        return (self.__class__, (self._msg, self.origin))
 
 
 class SocketConnectBlockedError(RuntimeError):
@@ -35,25 +69,123 @@ class SocketConnectBlockedError(RuntimeError):
         self,
         allowed: list[str],
         host: str | None,
+        origin: str | None = None,
+        method: str = "connect",
         *_args: Any,
         **_kwargs: Any,
     ) -> None:
         self._allowed = allowed
         self._host = host
-        allowed_str = ",".join(allowed)
-        msg = (
-            "A test tried to use socket.socket.connect() "
-            f'with host "{host}" (allowed: "{allowed_str}").'
-        )
-        warnings.warn(msg, stacklevel=2)
-        super().__init__(msg)
+        self.method = method
+        self.origin = origin or _thread_origin()
+        self._message: str | None = None
+        super().__init__()
+        _warn_blocked(self, str(host))
+
+    @property
+    def message(self) -> str:
+        # Joining the allow-list is deferred until the message is displayed,
+        # as clients that retry catch most of these errors unseen.
+        if self._message is None:
+            allowed_str = ",".join(self._allowed[:_ALLOWED_SUMMARY_LIMIT])
+            if len(self._allowed) > _ALLOWED_SUMMARY_LIMIT:
+                allowed_str += (
+                    f",... and {len(self._allowed) - _ALLOWED_SUMMARY_LIMIT} more"
+                )
+            self._message = (
+                f"A test tried to use socket.socket.{self.method}() "
+                f'with host "{self._host}" (allowed: "{allowed_str}").'
+            )
+            if self.origin:
+                self._message = f"{self._message} (from {self.origin})"
+        return self._message
+
+    @property
+    def args(self) -> tuple[str]:
+        return (self.message,)
+
+    @args.setter
+    def args(self, value: tuple[Any, ...]) -> None:
+        self._message = str(value[0]) if value else ""
+
+    def __str__(self) -> str:
+        return self.message
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.message!r})"
 
     def __reduce__(self) -> tuple[Any, tuple[Any, ...]]:
         # Reconstruct from the original constructor args so the exception
         # survives pickling by multiprocessing test runners (e.g. pytest-xdist,
         # Django's `--parallel`). The default `BaseException.__reduce__` would
         # replay `self.args` (the formatted message) and miss `host`.
-        return (self.__class__, (self._allowed, self._host))
+        return (
+            self.__class__,
+            (self._allowed, self._host, self.origin, self.method),
+        )
+
+
+class SocketConnectTimeoutError(TimeoutError):
+    def __init__(
+        self,
+        host: str | None,
+        timeout: float,
+        *_args: Any,
+        **_kwargs: Any,
+    ) -> None:
+        self._host = host
+        self._timeout = timeout
+        super().__init__(
+            f'Connecting to allowed host "{host}" timed out after {timeout}s '
+            "(capped by pytest-socket's connect timeout)."
+        )
+
+    def __reduce__(self) -> tuple[Any, tuple[Any, ...]]:
+        return (self.__class__, (self._host, self._timeout))
+
+
+# Frames from these files are skipped when locating the code that made
+# a blocked call, so warnings point at the caller rather than the guards.
+_INTERNAL_FILES = frozenset({__file__, socket.__file__})
+# Number of repeated blocked calls listed in the terminal summary.
+_REPEATED_SUMMARY_LIMIT = 10
+# Number of allowed hosts listed in blocked connect errors.
+_ALLOWED_SUMMARY_LIMIT = 10
+
+_current_test: str | None = None
+# Blocked calls of the current test, by call site and destination.
+_blocked_warnings: Counter[tuple[str, int, str]] = Counter()
+
+
+def _warn_blocked(exc: Exception, destination: str) -> None:
+    """Warn about a blocked call once per test, call site and destination.
+
+    Code that polls or retries would otherwise emit thousands of identical
+    warnings. Repeats are only counted, and listed in the terminal summary.
+    """
+    frame = sys._getframe(1)
+    while frame.f_back is not None and frame.f_code.co_filename in _INTERNAL_FILES:
+        frame = frame.f_back
+    key = (frame.f_code.co_filename, frame.f_lineno, destination)
+    _blocked_warnings[key] += 1
+    if _blocked_warnings[key] == 1:
+        warnings.warn_explicit(
+            str(exc),
+            UserWarning,
+            frame.f_code.co_filename,
+            frame.f_lineno,
+            module=frame.f_globals.get("__name__", "<string>"),
+        )
+
+
+def _keep_repeated_blocked_calls(socket_config: _PytestSocketConfig) -> None:
+    """Move the blocked calls the current test repeated into the terminal
+    summary, forgetting the others."""
+    for (filename, lineno, destination), count in _blocked_warnings.items():
+        if count > 1:
+            key = (_current_test, filename, lineno, destination)
+            socket_config.repeated_blocked_calls[key] += count
+    _blocked_warnings.clear()
 
 
 def pytest_addoption(parser: pytest.Parser) -> None:
@@ -73,11 +205,105 @@ def pytest_addoption(parser: pytest.Parser) -> None:
         metavar="ALLOWED_HOSTS_CSV",
         help="Only allow specified hosts through socket.socket.connect((host, port)).",
     )
+    group.addoption(
+        "--allow-hosts-file",
+        metavar="PATH",
+        help="Like --allow-hosts, reading hosts from a file, one or more per "
+        "line, with # comments.",
+    )
+    group.addoption(
+        "--socket-connect-timeout",
+        metavar="SECONDS",
+        type=float,
+        default=None,
+        help="Cap the time a connect to an allowed host may block.",
+    )
+    group.addoption(
+        "--socket-lazy-resolution",
+        action="store_true",
+        help="Resolve allowed host names only when a connect is not allowed "
+        "otherwise, instead of as each test starts.",
+    )
+    group.addoption(
+        "--socket-resolution-ttl",
+        metavar="SECONDS",
+        type=float,
+        default=60.0,
+        help="How long --socket-lazy-resolution remembers what a host name "
+        "resolved to, or that it failed to resolve (default: 60).",
+    )
+    group.addoption(
+        "--socket-filter-resolved",
+        choices=("any", "ipv4", "ipv6"),
+        default=None,
+        help="Make getaddrinfo() return only the addresses --allow-hosts "
+        "allows, those of the given family first unless any.",
+    )
     group.addoption(
         "--allow-unix-socket",
         action="store_true",
         help="Allow calls if they are to Unix domain sockets",
     )
+    group.addoption(
+        "--allow-unix-socket-paths",
+        metavar="PATHS",
+        help="Like --allow-unix-socket, but only allow connecting to these "
+        "comma separated Unix socket paths. Paths ending with / or * allow "
+        "any path they start, and @name names an abstract socket.",
+    )
+    group.addoption(
+        "--allow-loopback",
+        action="store_true",
+        help="Allow connections to loopback addresses, alone or on top of "
+        "--allow-hosts, without resolving or parsing them.",
+    )
+    group.addoption(
+        "--allow-local-listeners",
+        action="store_true",
+        help="Also allow connections to the addresses sockets of the test "
+        "process are bound to, such as servers started by tests.",
+    )
+    group.addoption(
+        "--socket-engine",
+        choices=("patch", "audit"),
+        default="patch",
+        help="Enforce the restrictions by patching the socket module (default), "
+        "or from an audit hook, which leaves socket.socket untouched.",
+    )
+    group.addoption(
+        "--socket-max-blocked-attempts",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Fail a test outright once it made N blocked attempts to reach "
+        "the same destination, instead of waiting through client retries.",
+    )
+    group.addoption(
+        "--socket-netns",
+        action="store_true",
+        help="Run the session in a Linux network namespace holding only a "
+        "loopback interface, falling back to --disable-socket where "
+        "namespaces are unavailable.",
+    )
+    group.addoption(
+        "--socket-propagate",
+        action="store_true",
+        help="Apply the restrictions to Python subprocesses and "
+        "multiprocessing workers started by tests.",
+    )
+    group.addoption(
+        "--socket-track-leaks",
+        choices=("warn", "fail"),
+        default=None,
+        help="Report sockets a test leaves open past its teardown, "
+        "either as a warning or as a teardown failure.",
+    )
+    group.addoption(
+        "--socket-track-threads",
+        action="store_true",
+        help="Flag network calls made by threads that outlive the test "
+        "that started them.",
+    )
 
 
 @pytest.fixture
@@ -95,63 +321,1523 @@ def socket_enabled(pytestconfig: pytest.Config) -> Iterator[None]:
     yield
 
 
+# Higher-scoped fixtures are set up within the first test that needs them,
+# under that test's restrictions. By requesting one of these, they can use
+# the network, or not, while being set up whatever the test's restrictions.
+@pytest.fixture(scope="class")
+def socket_enabled_class() -> Iterator[None]:
+    """enable socket.socket while setting up class-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="module")
+def socket_enabled_module() -> Iterator[None]:
+    """enable socket.socket while setting up module-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="package")
+def socket_enabled_package() -> Iterator[None]:
+    """enable socket.socket while setting up package-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="session")
+def socket_enabled_session() -> Iterator[None]:
+    """enable socket.socket while setting up session-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="class")
+def socket_disabled_class() -> Iterator[None]:
+    """disable socket.socket while setting up class-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="module")
+def socket_disabled_module() -> Iterator[None]:
+    """disable socket.socket while setting up module-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="package")
+def socket_disabled_package() -> Iterator[None]:
+    """disable socket.socket while setting up package-scoped fixtures requesting this"""
+    yield
+
+
+@pytest.fixture(scope="session")
+def socket_disabled_session() -> Iterator[None]:
+    """disable socket.socket while setting up session-scoped fixtures requesting this"""
+    yield
+
+
+_SETUP_FIXTURES = {
+    f"socket_{state}_{scope}": state == "enabled"
+    for state in ("enabled", "disabled")
+    for scope in ("class", "module", "package", "session")
+}
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(
+    fixturedef: Any, request: pytest.FixtureRequest
+) -> Iterator[None]:
+    enabled = next(
+        (
+            _SETUP_FIXTURES[name]
+            for name in fixturedef.argnames
+            if name in _SETUP_FIXTURES
+        ),
+        None,
+    )
+    if enabled is None:
+        yield
+        return
+
+    # Restore the test's restrictions afterwards, including after any change
+    # the fixture made itself (e.g. calling `socket_allow_hosts()`).
+    policy = _active_policy()
+    if enabled:
+        _set_policy(_UNRESTRICTED)
+    else:
+        socket_config = request.config.stash[_STASH_KEY]
+        disable_socket(socket_config.allow_unix_socket)
+    yield
+    _set_policy(policy)
+
+
+class _SocketAllow:
+    """Add entries to, or remove them from, the active allow-list.
+
+    Only the entry being added is resolved; the other entries keep the
+    addresses they were compiled with.
+    """
+
+    def __init__(self, socket_config: _PytestSocketConfig) -> None:
+        self._config = socket_config
+
+    def add(self, host: str) -> None:
+        """Allow connections to `host`, an IP address, host name, domain
+        pattern or CIDR network range, optionally restricted to some ports,
+        on top of the hosts already allowed."""
+        addresses, networks, patterns, ports = self._entries()
+        plain_hosts, new_ports = _partition_ports([host], self._config.resolution_cache)
+        plain_hosts, new_networks = _partition_allowed(plain_hosts)
+        plain_hosts, new_patterns = _partition_patterns(plain_hosts)
+        addresses.update(
+            normalize_allowed_hosts(plain_hosts, self._config.resolution_cache)
+        )
+        networks.extend(net for net in new_networks if net not in networks)
+        patterns.extend(pat for pat in new_patterns if pat not in patterns)
+        ports.extend(rule for rule in new_ports if rule not in ports)
+        self._update(addresses, networks, patterns, ports)
+
+    def remove(self, host: str) -> None:
+        """Stop allowing connections to `host`, as passed to `add()` or
+        listed in `--allow-hosts` or the `allow_hosts` marker."""
+        addresses, networks, patterns, ports = self._entries()
+        plain_hosts, removed_networks = _partition_allowed([host])
+        kept_ports = [rule for rule in ports if rule.entry != host.strip()]
+        if plain_hosts and plain_hosts[0] in addresses:
+            del addresses[plain_hosts[0]]
+        elif plain_hosts and plain_hosts[0] in patterns:
+            patterns.remove(plain_hosts[0])
+        elif removed_networks and removed_networks[0] in networks:
+            networks.remove(removed_networks[0])
+        elif len(kept_ports) < len(ports):
+            ports = kept_ports
+        else:
+            raise ValueError(f'"{host}" is not in the allow-list.')
+        self._update(addresses, networks, patterns, ports)
+
+    def _entries(
+        self,
+    ) -> tuple[dict[str, set[str]], list[_IPNetwork], list[str], list[_PortRule]]:
+        allowed_hosts = _active_policy().allowed_hosts
+        if allowed_hosts is None:
+            return {}, [], [], []
+        return (
+            dict(allowed_hosts.addresses),
+            list(allowed_hosts.networks),
+            list(allowed_hosts.patterns),
+            list(allowed_hosts.ports),
+        )
+
+    def _update(
+        self,
+        addresses: dict[str, set[str]],
+        networks: list[_IPNetwork],
+        patterns: list[str],
+        ports: list[_PortRule],
+    ) -> None:
+        policy = _active_policy()
+        resolver: _ResolutionCache | None
+        if policy.allowed_hosts is None:
+            allow_unix_socket = self._config.allow_unix_socket
+            connect_timeout = self._config.connect_timeout
+            resolver = self._config.lazy_resolver or self._config.resolution_cache
+            loopback = self._config.allow_loopback
+        else:
+            allow_unix_socket = policy.allowed_hosts.allow_unix_socket
+            connect_timeout = policy.allowed_hosts.connect_timeout
+            resolver = policy.allowed_hosts.resolver
+            loopback = policy.allowed_hosts.loopback
+        allowed_hosts = _build_allowed_hosts(
+            addresses,
+            networks,
+            allow_unix_socket,
+            connect_timeout,
+            patterns,
+            resolver,
+            lazy=self._config.lazy_resolver is not None,
+            loopback=loopback,
+            ports=ports,
+        )
+        # Allowing hosts lifts `--disable-socket`, as the `allow_hosts`
+        # marker does.
+        _set_policy(replace(policy, block_sockets=False, allowed_hosts=allowed_hosts))
+
+
+@pytest.fixture
+def socket_allow(pytestconfig: pytest.Config) -> Iterator[_SocketAllow]:
+    """add hosts to, or remove them from, the allow-list of this test function"""
+    yield _SocketAllow(pytestconfig.stash[_STASH_KEY])
+
+
+# Upper bound on the host names a `_ResolutionCache` remembers.
+_RESOLUTION_CACHE_SIZE = 4096
+# Upper bound on the distinct allow-lists kept compiled between tests.
+_COMPILED_ALLOW_HOSTS_SIZE = 256
+# Stands for the command-line allow-list among the compiled ones.
+_CLI_ALLOW_HOSTS = object()
+
+
+class _ResolutionCache:
+    """What host names resolved to, remembered for `ttl` seconds, or for
+    the whole session without one.
+
+    Failures are remembered as well, as resolving a dead name may take
+    seconds each time. The least recently used entries are dropped beyond
+    `maxsize`, so sessions allowing a new host name in every test, such as
+    per-tenant subdomains, do not keep growing.
+    """
+
+    def __init__(
+        self, ttl: float | None = None, maxsize: int = _RESOLUTION_CACHE_SIZE
+    ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, set[str]]] = OrderedDict()
+
+    def resolve(self, hostname: str) -> set[str]:
+        now = time.monotonic()
+        entry = self._entries.get(hostname)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            self._entries.move_to_end(hostname)
+            return entry[1]
+        self.misses += 1
+        addresses = resolve_hostnames(hostname)
+        self._entries.pop(hostname, None)
+        if len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        expires = math.inf if self.ttl is None else now + self.ttl
+        self._entries[hostname] = (expires, addresses)
+        return addresses
+
+    def expires(self, hostname: str) -> float:
+        """When what `hostname` resolved to is forgotten, or 0 when it is
+        not remembered at all."""
+        entry = self._entries.get(hostname)
+        return 0.0 if entry is None else entry[0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def summary(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+            f"{len(self)} of at most {self.maxsize} host names cached"
+        )
+
+
 @dataclass
 class _PytestSocketConfig:
     socket_disabled: bool
     socket_force_enabled: bool
     allow_unix_socket: bool
     allow_hosts: str | list[str] | None
-    resolution_cache: dict[str, set[str]] = field(default_factory=dict)
+    connect_timeout: float | None
+    allow_loopback: bool = False
+    netns: bool = False
+    netns_unavailable: str | None = None
+    resolution_cache: _ResolutionCache = field(default_factory=_ResolutionCache)
+    lazy_resolver: _ResolutionCache | None = None
+    # Allow-lists compiled by earlier tests, keyed by hosts and connect timeout,
+    # least recently used first.
+    compiled_allow_hosts: OrderedDict[tuple[Any, ...], _AllowedHosts | None] = field(
+        default_factory=OrderedDict
+    )
+    # Set by `--socket-max-blocked-attempts`.
+    max_blocked_attempts: int | None = None
+    # Set by `--socket-filter-resolved`, to `"any"` or the preferred family.
+    filter_resolved: str | None = None
+    # Set by `--allow-unix-socket-paths`.
+    unix_socket_paths: _UnixSocketPaths | None = None
+    # Destinations checked against the active policy, by method and verdict.
+    destination_checks: Counter[tuple[str, bool]] = field(default_factory=Counter)
+    # Blocked calls a test repeated, by test, call site and destination, for
+    # the terminal summary.
+    repeated_blocked_calls: Counter[tuple[str | None, str, int, str]] = field(
+        default_factory=Counter
+    )
 
 
 _STASH_KEY = pytest.StashKey[_PytestSocketConfig]()
+# The configurations of the sessions running in this process, innermost last,
+# which the guards read the session's options from. Sessions nest when a test
+# runs pytest in-process.
+_session_configs: list[_PytestSocketConfig] = []
+# The options in effect outside of any session.
+_NO_SESSION = _PytestSocketConfig(
+    socket_disabled=False,
+    socket_force_enabled=False,
+    allow_unix_socket=False,
+    allow_hosts=None,
+    connect_timeout=None,
+)
+
+
+def _session_config() -> _PytestSocketConfig:
+    return _session_configs[-1] if _session_configs else _NO_SESSION
+
+
+# Number of stack frames recorded for each tracked socket's creation site.
+_LEAK_STACK_LIMIT = 8
+# Tracked sockets kept before closed ones are dropped within a test.
+_LEAK_PRUNE_MIN = 64
+_CreationSite = list[traceback.FrameSummary]
+
+
+class _SocketLeakTracker:
+    """Track sockets through weak references and report the ones
+    a test leaves open past its teardown.
+
+    Registered as a plugin only when `--socket-track-leaks` is given,
+    as it wraps `socket.socket.__init__` for the whole session.
+    """
+
+    def __init__(self, fail: bool) -> None:
+        self.fail = fail
+        self.peak_open = 0
+        self.leaked = 0
+        self._open: weakref.WeakKeyDictionary[socket.socket, _CreationSite] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._test_sockets: list[weakref.ref[socket.socket]] = []
+        self._in_test = False
+        self._prune_above = _LEAK_PRUNE_MIN
+
+        def tracked_init(inst: socket.socket, *args: Any, **kwargs: Any) -> None:
+            _true_socket_init(inst, *args, **kwargs)
+            self.record(inst)
+
+        _true_socket.__init__ = tracked_init  # type: ignore[assignment,method-assign]
+
+    def record(self, sock: socket.socket) -> None:
+        self._open[sock] = traceback.extract_stack(limit=_LEAK_STACK_LIMIT + 2)[:-2]
+        # Closed sockets are only dropped once they pile up, or as tests end,
+        # to keep creating sockets cheap. Until then, the ones still
+        # referenced are counted as open.
+        if len(self._open) > self._prune_above:
+            self._prune()
+        self.peak_open = max(self.peak_open, len(self._open))
+        if self._in_test:
+            self._test_sockets.append(weakref.ref(sock))
+
+    def _prune(self) -> None:
+        for closed in [s for s in self._open.keys() if s.fileno() == -1]:
+            del self._open[closed]
+        self._prune_above = max(_LEAK_PRUNE_MIN, 2 * len(self._open))
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef: Any) -> Iterator[None]:
+        # Sockets of fixtures outliving the test are not its own to close.
+        in_test = self._in_test
+        if fixturedef.scope != "function":
+            self._in_test = False
+        yield
+        self._in_test = in_test
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self) -> None:
+        self._in_test = True
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_runtest_teardown(self) -> None:
+        # `trylast` runs this after the fixture finalizers had their chance
+        # to close the sockets they opened.
+        leaked = [
+            sock
+            for ref in self._test_sockets
+            if (sock := ref()) is not None and sock.fileno() != -1
+        ]
+        self._test_sockets.clear()
+        self._in_test = False
+        self._prune()
+        if not leaked:
+            return
+
+        self.leaked += len(leaked)
+        lines = [f"A test left {len(leaked)} socket(s) open past teardown:"]
+        for sock in leaked:
+            lines.append(f"{sock!r} created at:")
+            lines.extend(
+                line.rstrip("\n") for line in traceback.format_list(self._open[sock])
+            )
+        msg = "\n".join(lines)
+        if self.fail:
+            pytest.fail(msg, pytrace=False)
+        warnings.warn(msg)
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        terminalreporter.write_sep("-", "pytest-socket leak tracking")
+        terminalreporter.write_line(
+            f"peak open sockets: {self.peak_open}, "
+            f"leaked past teardown: {self.leaked}"
+        )
+
+    def pytest_unconfigure(self) -> None:
+        _true_socket.__init__ = _true_socket_init  # type: ignore[method-assign]
+
+
+# Connecting to a wildcard address reaches the loopback interface.
+_WILDCARD_ADDRESSES = {"0.0.0.0": "127.0.0.1", "::": "::1"}
+
+
+class _ListenerTracker:
+    """Record the addresses sockets get bound to, so that connections to
+    servers started by the tests themselves are allowed without allowing
+    the whole loopback interface.
+
+    Registered as a plugin only when `--allow-local-listeners` is given,
+    as it wraps `socket.socket.bind` for the whole session.
+    """
+
+    def __init__(self) -> None:
+        self._bound: dict[Any, weakref.ref[socket.socket]] = {}
+
+        def tracked_bind(inst: socket.socket, address: Any) -> None:
+            _true_bind(inst, address)
+            self.record(inst)
+
+        _true_socket.bind = tracked_bind  # type: ignore[assignment,method-assign]
+
+    def record(self, sock: socket.socket) -> None:
+        for endpoint in [e for e, ref in self._bound.items() if not self._open(ref)]:
+            del self._bound[endpoint]
+        # Ephemeral ports are only known once bound, hence `getsockname()`.
+        endpoint = _endpoint(sock.getsockname())
+        self._bound[endpoint] = weakref.ref(sock)
+        if isinstance(endpoint, tuple) and endpoint[0] in _WILDCARD_ADDRESSES:
+            loopback = (_WILDCARD_ADDRESSES[endpoint[0]], endpoint[1])
+            self._bound[loopback] = weakref.ref(sock)
+
+    def allows(self, address: Any) -> bool:
+        ref = self._bound.get(_endpoint(address))
+        return ref is not None and self._open(ref)
+
+    @staticmethod
+    def _open(ref: weakref.ref[socket.socket]) -> bool:
+        sock = ref()
+        return sock is not None and sock.fileno() != -1
+
+    def pytest_unconfigure(self) -> None:
+        global _listener_tracker
+        _listener_tracker = None
+        _true_socket.bind = _true_bind  # type: ignore[method-assign]
+
+
+def _endpoint(address: Any) -> Any:
+    # IPv6 addresses carry flow info and scope id after the port.
+    if isinstance(address, tuple):
+        return address[:2]
+    return address
+
+
+_listener_tracker: _ListenerTracker | None = None
+
+
+class _ThreadTracker:
+    """Remember which test started each thread still alive after that
+    test's teardown, and flag the network calls those threads make.
+
+    Calls are observed through an audit hook so they are seen in every
+    mode, including tests where sockets are enabled. Threads started by
+    higher-scoped fixtures (e.g. a session-wide server) are expected to
+    outlive a single test and are not flagged.
+    """
+
+    def __init__(self) -> None:
+        self.runaway_calls: Counter[tuple[str, str]] = Counter()
+        self._spawned_by: weakref.WeakKeyDictionary[threading.Thread, str] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._shared: weakref.WeakSet[threading.Thread] = weakref.WeakSet()
+        self._before_test: set[threading.Thread] = set()
+
+    def spawned_by(self, thread: threading.Thread) -> str | None:
+        return self._spawned_by.get(thread)
+
+    def check(self, event: str) -> None:
+        thread = threading.current_thread()
+        nodeid = self._spawned_by.get(thread)
+        if nodeid is None:
+            return
+        key = (thread.name, nodeid)
+        if key not in self.runaway_calls:
+            warnings.warn(
+                f'Thread "{thread.name}" started by finished test "{nodeid}" '
+                f"made a network call ({event})."
+            )
+        self.runaway_calls[key] += 1
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef: Any) -> Iterator[None]:
+        if fixturedef.scope == "function":
+            yield
+            return
+        before = set(threading.enumerate())
+        yield
+        self._shared.update(set(threading.enumerate()) - before)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self) -> None:
+        self._before_test = set(threading.enumerate())
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_runtest_teardown(self, item: pytest.Item) -> None:
+        for thread in threading.enumerate():
+            if thread not in self._before_test and thread not in self._shared:
+                self._spawned_by[thread] = item.nodeid
+        self._before_test = set()
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        if not self.runaway_calls:
+            return
+        terminalreporter.write_sep("-", "pytest-socket runaway threads")
+        for (name, nodeid), count in self.runaway_calls.most_common():
+            terminalreporter.write_line(
+                f'thread "{name}" started by {nodeid}: {count} network call(s)'
+            )
+
+    def pytest_unconfigure(self) -> None:
+        global _thread_tracker
+        _thread_tracker = None
+
+
+_thread_tracker: _ThreadTracker | None = None
+_audit_hook_installed = False
+# Set by `--socket-engine=audit`, where the audit hook rather than patches
+# to the `socket` module enforces the active policy.
+_audit_engine = False
+
+
+def _audit_network_activity(event: str, args: tuple[Any, ...]) -> None:
+    # Audit hooks cannot be removed, so this stays installed for the life
+    # of the process and returns early once the session no longer needs it.
+    if not event.startswith("socket."):
+        return
+    tracker = _thread_tracker
+    if tracker is not None:
+        tracker.check(event)
+    if _audit_engine and (guard := _AUDIT_GUARDS.get(event)) is not None:
+        guard(args)
+
+
+def _install_audit_hook() -> None:
+    global _audit_hook_installed
+    if not _audit_hook_installed:
+        sys.addaudithook(_audit_network_activity)
+        _audit_hook_installed = True
+
+
+def _thread_origin() -> str | None:
+    """Describe the current thread, if it is not the main thread."""
+    thread = threading.current_thread()
+    if thread is threading.main_thread():
+        return None
+    origin = f'thread "{thread.name}"'
+    tracker = _thread_tracker
+    if tracker is not None and (nodeid := tracker.spawned_by(thread)):
+        origin += f' started by finished test "{nodeid}"'
+    return origin
 
 
 def _is_unix_socket(family: int) -> bool:
     return hasattr(socket, "AF_UNIX") and family == socket.AF_UNIX
 
 
-def _guarded_getaddrinfo(*_args: Any, **_kwargs: Any) -> Any:
-    raise SocketBlockedError("A test tried to use socket.getaddrinfo.")
+# Blocked attempts of the current test in this context, by destination.
+_blocked_attempts: ContextVar[Counter[str] | None] = ContextVar(
+    "pytest_socket_blocked_attempts", default=None
+)
+_PREFERRED_FAMILIES = {"ipv4": socket.AF_INET, "ipv6": socket.AF_INET6}
 
 
-def _guarded_gethostbyname(*_args: Any, **_kwargs: Any) -> Any:
-    raise SocketBlockedError("A test tried to use socket.gethostbyname.")
+def _count_blocked_attempt(destination: str) -> None:
+    """Fail the current test once it keeps retrying a blocked destination.
 
+    Clients that retry with backoff catch the blocking error, so the test
+    may sleep through every retry before failing. `pytest.fail()` raises
+    an exception outside of the `Exception` hierarchy, which stops them.
+    """
+    socket_config = _session_config()
+    if socket_config.max_blocked_attempts is None:
+        return
+    blocked_attempts = _blocked_attempts.get()
+    if blocked_attempts is None:
+        blocked_attempts = Counter()
+        _blocked_attempts.set(blocked_attempts)
+    blocked_attempts[destination] += 1
+    attempts = blocked_attempts[destination]
+    if attempts >= socket_config.max_blocked_attempts:
+        pytest.fail(
+            f'A test made {attempts} blocked attempts to reach "{destination}"; '
+            "failing now instead of waiting for its retries "
+            f"(--socket-max-blocked-attempts={socket_config.max_blocked_attempts})."
+        )
 
-def disable_socket(allow_unix_socket: bool = False) -> None:
-    """disable socket.socket to disable the Internet. useful in testing."""
 
-    class GuardedSocket(socket.socket):
-        """socket guard to disable socket creation (from pytest-socket)"""
+def _is_loopback(host: str) -> bool:
+    """Whether `host` is `localhost` or a loopback address, telling from
+    its text alone, as connects to the loopback interface are frequent."""
+    if host.startswith("::ffff:"):
+        # An IPv4-mapped IPv6 address.
+        host = host[7:]
+    elif host == "::1" or host == "localhost":
+        return True
+    return (
+        host.startswith("127.")
+        and host.count(".") == 3
+        and host.replace(".", "").isdigit()
+    )
+
+
+class _UnixSocketPaths:
+    """The Unix socket paths connects are allowed to, with
+    `--allow-unix-socket-paths`.
+
+    Prefixes are matched at once by `str.startswith()`. Names in the
+    abstract namespace, written `@name`, start with a null byte instead.
+    """
+
+    def __init__(self, entries: Iterable[str]) -> None:
+        self.allowed_list: list[str] = []
+        self.paths: set[str] = set()
+        prefixes: list[str] = []
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            self.allowed_list.append(entry)
+            if entry.startswith("@"):
+                path = "\0" + entry[1:]
+            else:
+                path = os.path.abspath(entry)
+                # `abspath()` drops the trailing slash marking a prefix.
+                if entry.endswith("/") and not path.endswith("/"):
+                    path += "/"
+            if path.endswith("*"):
+                prefixes.append(path[:-1])
+            elif path.endswith("/"):
+                prefixes.append(path)
+            else:
+                self.paths.add(path)
+        self.prefixes = tuple(prefixes)
+
+    @classmethod
+    def load(cls, dumped: str) -> _UnixSocketPaths:
+        """Restore paths compiled by the parent process, whose working
+        directory relative entries were resolved against."""
+        unix_socket_paths = cls([])
+        allowed_list, paths, prefixes = json.loads(dumped)
+        unix_socket_paths.allowed_list = allowed_list
+        unix_socket_paths.paths = set(paths)
+        unix_socket_paths.prefixes = tuple(prefixes)
+        return unix_socket_paths
+
+    @cached_property
+    def dumped(self) -> str:
+        return json.dumps([self.allowed_list, sorted(self.paths), self.prefixes])
+
+    def allows(self, address: Any) -> bool:
+        try:
+            path = os.fsdecode(address)
+        except TypeError:
+            return False
+        if not path.startswith("\0"):
+            path = os.path.abspath(path)
+        return path in self.paths or path.startswith(self.prefixes)
+
+
+@dataclass(frozen=True)
+class _AllowedHosts:
+    """A compiled `allow_hosts` list, matched against connect destinations."""
+
+    hosts: frozenset[str]
+    networks: tuple[_IPNetwork, ...]
+    # The entries listed in error messages, rendered from the fields here.
+    allowed_list: list[str] = field(compare=False)
+    allow_unix_socket: bool = False
+    connect_timeout: float | None = None
+    # The addresses each plain host entry allows, so entries can be added
+    # or removed without resolving the others again.
+    addresses: dict[str, set[str]] = field(default_factory=dict, compare=False)
+    # Domain patterns such as `*.svc.cluster.local`, which are never resolved
+    # up front. Only the names code actually resolves or connects to are
+    # matched against them.
+    patterns: tuple[str, ...] = ()
+    # Host names left unresolved until a connect is not allowed otherwise,
+    # with `--socket-lazy-resolution`.
+    unresolved: tuple[str, ...] = ()
+    # Resolves the host names above, and those passed to `connect()`.
+    resolver: _ResolutionCache | None = field(default=None, compare=False)
+    # Whether connecting to a host name is allowed, and until when, by host
+    # name, so that repeated connects only cost a lookup. Verdicts expire
+    # with what the names they depend on resolved to, and the least recently
+    # used ones are dropped like those.
+    verdicts: OrderedDict[str, tuple[float, bool]] = field(
+        default_factory=OrderedDict, compare=False
+    )
+    # Allow any loopback address, with `--allow-loopback`.
+    loopback: bool = False
+    # Entries restricted to some ports, such as `127.0.0.1:5432`.
+    ports: tuple[_PortRule, ...] = ()
+
+    @cached_property
+    def domains(self) -> _DomainTrie:
+        return _DomainTrie(self.patterns)
+
+    @cached_property
+    def port_index(self) -> _PortIndex:
+        return _PortIndex(self.ports)
+
+    @cached_property
+    def dumped(self) -> str:
+        """The JSON form handed down to child interpreters, computed once
+        as tests switch back and forth between the same allow-lists."""
+        return json.dumps(
+            {
+                "hosts": sorted(self.hosts),
+                "networks": [str(net) for net in self.networks],
+                "allow_unix_socket": self.allow_unix_socket,
+                "connect_timeout": self.connect_timeout,
+                "patterns": self.patterns,
+                "unresolved": self.unresolved,
+                "resolver": (
+                    {"ttl": self.resolver.ttl} if self.resolver is not None else None
+                ),
+                "loopback": self.loopback,
+                "ports": [
+                    [
+                        rule.entry,
+                        sorted(rule.hosts),
+                        [str(net) for net in rule.networks],
+                        rule.low,
+                        rule.high,
+                    ]
+                    for rule in self.ports
+                ],
+            }
+        )
+
+    def allows(
+        self, inst: socket.socket, host: str | None, port: int | None = None
+    ) -> bool:
+        if self._allows_host(inst, host):
+            return True
+        return (
+            bool(self.ports)
+            and bool(host)
+            and port is not None
+            and (self.allows_port(str(host), port))
+        )
+
+    def _allows_host(self, inst: socket.socket, host: str | None) -> bool:
+        if self.loopback and host and _is_loopback(host):
+            return True
+        if host in self.hosts or (
+            _is_unix_socket(inst.family) and self.allow_unix_socket
+        ):
+            return True
+        if not host:
+            return False
+        if self.patterns:
+            if host in _resolved_pattern_addresses(self) or self.domains.matches(host):
+                return True
+        if is_ipaddress(host):
+            return self.allows_address(host)
+        if self.resolver is None:
+            return False
+
+        now = time.monotonic()
+        entry = self.verdicts.get(host)
+        if entry is not None and entry[0] > now:
+            self.verdicts.move_to_end(host)
+            return entry[1]
+        verdict = any(
+            address in self.hosts or self.allows_address(address)
+            for address in self.resolver.resolve(host)
+        )
+        # Lazily resolved names skipped above, which are not cached, do not
+        # bear on the verdict.
+        expires = min(
+            [
+                self.resolver.expires(host),
+                *filter(None, map(self.resolver.expires, self.unresolved)),
+            ]
+        )
+        self.verdicts.pop(host, None)
+        if len(self.verdicts) >= self.resolver.maxsize:
+            self.verdicts.popitem(last=False)
+        self.verdicts[host] = (expires, verdict)
+        return verdict
+
+    def allows_address(self, address: str) -> bool:
+        """Whether an IP address is within the allowed networks, or is one
+        a lazily resolved host name resolves to."""
+        if self.loopback and _is_loopback(address):
+            return True
+        if self.networks:
+            ip = ipaddress.ip_address(address)
+            if any(ip in net for net in self.networks):
+                return True
+        if self.resolver is not None and self.unresolved:
+            return any(
+                address in self.resolver.resolve(name) for name in self.unresolved
+            )
+        return False
+
+    def allows_port(self, host: str, port: int) -> bool:
+        """Whether a port rule allows connecting to `port` of `host`, or of
+        an address the host name resolves to."""
+        if self.port_index.allows(host, port):
+            return True
+        if self.resolver is None or is_ipaddress(host):
+            return False
+        return any(
+            self.port_index.allows(address, port)
+            for address in self.resolver.resolve(host)
+        )
+
+
+@dataclass(frozen=True)
+class _PortRule:
+    """An allow-list entry such as `127.0.0.1:5432`, `[::1]:8000-8099` or
+    `10.0.0.0/8:443`, allowing its hosts or networks on ports `low` to
+    `high` only."""
+
+    entry: str
+    hosts: frozenset[str]
+    networks: tuple[_IPNetwork, ...]
+    low: int
+    high: int
+
+
+# Port ranges up to this long are indexed port by port; longer ones are
+# checked one after the other.
+_PORT_RANGE_INDEX_LIMIT = 1024
+
+
+class _PortIndex:
+    """Port rules indexed by port, then by address, so matching an exact
+    `host:port` takes two lookups however many rules there are."""
+
+    def __init__(self, rules: Iterable[_PortRule]) -> None:
+        hosts: defaultdict[int, set[str]] = defaultdict(set)
+        networks: defaultdict[int, list[_IPNetwork]] = defaultdict(list)
+        self.ranges: list[_PortRule] = []
+        for rule in rules:
+            if rule.high - rule.low >= _PORT_RANGE_INDEX_LIMIT:
+                self.ranges.append(rule)
+                continue
+            for port in range(rule.low, rule.high + 1):
+                hosts[port].update(rule.hosts)
+                networks[port].extend(rule.networks)
+        self.hosts = {port: frozenset(names) for port, names in hosts.items()}
+        self.networks = {port: tuple(nets) for port, nets in networks.items() if nets}
+
+    def allows(self, host: str, port: int) -> bool:
+        hosts = self.hosts.get(port)
+        if hosts is not None and host in hosts:
+            return True
+        networks = self.networks.get(port, ())
+        for rule in self.ranges:
+            if rule.low <= port <= rule.high:
+                if host in rule.hosts:
+                    return True
+                networks += rule.networks
+        if not networks or not is_ipaddress(host):
+            return False
+        ip = ipaddress.ip_address(host)
+        return any(ip in net for net in networks)
+
+
+def _port_from_address(address: Any) -> int | None:
+    if isinstance(address, tuple) and len(address) > 1:
+        port = address[1]
+        if isinstance(port, int):
+            return port
+    return None
+
+
+class _DomainTrie:
+    """Domain patterns stored label by label, from the top-level domain
+    down, so matching a name takes one lookup per label of that name,
+    however many patterns there are."""
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._root: dict[str, Any] = {}
+        for pattern in patterns:
+            node = self._root
+            for label in reversed(pattern.lstrip("*").strip(".").lower().split(".")):
+                node = node.setdefault(label, {})
+            # The patterns match subdomains, not the domain itself.
+            node[_ANY_SUBDOMAIN] = True
+
+    def matches(self, hostname: str) -> bool:
+        node = self._root
+        for label in reversed(hostname.rstrip(".").lower().split(".")):
+            if _ANY_SUBDOMAIN in node and node is not self._root:
+                return True
+            child = node.get(label)
+            if child is None:
+                return False
+            node = child
+        return False
+
+
+# Marks trie nodes whose subdomains are allowed. Never a valid DNS label.
+_ANY_SUBDOMAIN = "*"
+# Addresses that names matching a domain pattern of an allow-list resolved to
+# during the current test, in this context, which connects to those addresses
+# are allowed for while the allow-list is in effect.
+_pattern_addresses: ContextVar[tuple[_AllowedHosts, set[str]] | None] = ContextVar(
+    "pytest_socket_pattern_addresses", default=None
+)
+
+
+def _resolved_pattern_addresses(allowed_hosts: _AllowedHosts) -> set[str]:
+    entry = _pattern_addresses.get()
+    if entry is None or entry[0] is not allowed_hosts:
+        return set()
+    return entry[1]
+
+
+def _remember_pattern_addresses(
+    policy: _Policy, host: Any, addresses: Iterable[str]
+) -> None:
+    """Remember what `host` resolved to, when it matches a domain pattern."""
+    allowed_hosts = policy.allowed_hosts
+    if (
+        allowed_hosts is None
+        or not allowed_hosts.patterns
+        or not isinstance(host, str)
+        or not allowed_hosts.domains.matches(host)
+    ):
+        return
+    entry = _pattern_addresses.get()
+    if entry is None or entry[0] is not allowed_hosts:
+        entry = (allowed_hosts, set())
+        _pattern_addresses.set(entry)
+    entry[1].update(addresses)
+
+
+@dataclass(frozen=True)
+class _Policy:
+    """The restrictions the guards enforce.
+
+    `block_sockets` is set by `disable_socket()` and blocks socket creation
+    and name resolution, while `allowed_hosts` is set by
+    `socket_allow_hosts()` and restricts `connect()`.
+    """
+
+    block_sockets: bool = False
+    allow_unix_socket: bool = False
+    allowed_hosts: _AllowedHosts | None = None
+
+
+_UNRESTRICTED = _Policy()
+
+# The guards consult the policy set in the current context first, so tests
+# run concurrently in threads (e.g. pytest-run-parallel, free-threaded
+# builds) each keep their own. Threads without one, such as those started
+# by a test, follow the process-wide policy.
+_context_policy: ContextVar[_Policy | None] = ContextVar(
+    "pytest_socket_policy", default=None
+)
+_process_policy = _UNRESTRICTED
+# How many contexts have a restricting policy of their own, which keeps the
+# guards installed whatever the process-wide policy.
+_context_restrictions = 0
+_context_restrictions_lock = threading.Lock()
+# The thread running the pytest session sets the process-wide policy.
+_session_thread: threading.Thread | None = None
+# Child interpreters install the policy serialized in the file this variable
+# names at startup, through the `pytest_socket_policy.pth` file.
+_POLICY_ENV_VAR = "PYTEST_SOCKET_POLICY"
+# The session's policy file, with `--socket-propagate`.
+_policy_file: str | None = None
+
+
+def _active_policy() -> _Policy:
+    policy = _context_policy.get()
+    return _process_policy if policy is None else policy
+
+
+def _in_session_thread() -> bool:
+    return _session_thread is None or threading.current_thread() is _session_thread
+
+
+def _set_policy(policy: _Policy) -> None:
+    global _process_policy
+    if _in_session_thread():
+        _process_policy = policy
+        _set_context_policy(None)
+        # Threads with restrictions of their own still rely on the guards.
+        _install_guards(policy, uninstall=_context_restrictions == 0)
+        if _policy_file is not None:
+            _export_policy(policy, _policy_file)
+    else:
+        _set_context_policy(policy)
+        # Another thread may still rely on the guards, so leave them in place.
+        _install_guards(policy, uninstall=False)
+
+
+def _set_context_policy(policy: _Policy | None) -> None:
+    global _context_restrictions
+    previous = _context_policy.get()
+    _context_policy.set(policy)
+    change = _restricts(policy) - _restricts(previous)
+    if change:
+        with _context_restrictions_lock:
+            _context_restrictions += change
+
+
+def _restricts(policy: _Policy | None) -> bool:
+    return policy is not None and policy != _UNRESTRICTED
+
+
+def _dump_policy(
+    policy: _Policy, unix_socket_paths: _UnixSocketPaths | None = None
+) -> str:
+    """Serialize `policy` as JSON lines: its flags, its allow-list, then the
+    Unix socket paths allowed with `--allow-unix-socket-paths`, if any."""
+    flags = json.dumps([policy.block_sockets, policy.allow_unix_socket])
+    allowed_hosts = "null"
+    if policy.allowed_hosts is not None:
+        allowed_hosts = policy.allowed_hosts.dumped
+    raw = f"{flags}\n{allowed_hosts}\n"
+    if unix_socket_paths is not None:
+        raw += f"{unix_socket_paths.dumped}\n"
+    return raw
+
+
+def _load_policy(raw: str) -> _Policy:
+    flags, dumped = raw.splitlines()[:2]
+    block_sockets, allow_unix_socket = json.loads(flags)
+    hosts = json.loads(dumped)
+    allowed_hosts = None
+    if hosts is not None:
+        networks = tuple(ipaddress.ip_network(net) for net in hosts["networks"])
+        ports = tuple(
+            _PortRule(
+                entry,
+                frozenset(names),
+                tuple(ipaddress.ip_network(net) for net in rule_networks),
+                low,
+                high,
+            )
+            for entry, names, rule_networks, low, high in hosts["ports"]
+        )
+        allowed_hosts = _AllowedHosts(
+            hosts=frozenset(hosts["hosts"]),
+            networks=networks,
+            allowed_list=sorted(
+                hosts["hosts"]
+                + hosts["networks"]
+                + hosts["patterns"]
+                + [rule.entry for rule in ports]
+                + (["loopback"] if hosts["loopback"] else [])
+            ),
+            allow_unix_socket=hosts["allow_unix_socket"],
+            connect_timeout=hosts["connect_timeout"],
+            patterns=tuple(hosts["patterns"]),
+            unresolved=tuple(hosts["unresolved"]),
+            resolver=(
+                _ResolutionCache(hosts["resolver"]["ttl"])
+                if hosts["resolver"] is not None
+                else None
+            ),
+            loopback=hosts["loopback"],
+            ports=ports,
+        )
+    return _Policy(
+        block_sockets=block_sockets,
+        allow_unix_socket=allow_unix_socket,
+        allowed_hosts=allowed_hosts,
+    )
+
+
+def _export_policy(policy: _Policy, path: str) -> None:
+    """Hand the compiled policy down to child interpreters, so they need
+    neither pytest's configuration nor another round of name resolution.
+
+    Allow-lists read from a file may be far larger than an environment
+    variable can hold, so only the path of the session's policy file is
+    exported.
+    """
+    if policy == _UNRESTRICTED:
+        os.environ.pop(_POLICY_ENV_VAR, None)
+        return
+    # Written aside and moved into place, so that children starting
+    # meanwhile never read half a policy.
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(_dump_policy(policy, _session_config().unix_socket_paths))
+    os.replace(f"{path}.tmp", path)
+    os.environ[_POLICY_ENV_VAR] = path
+
+
+def _install_propagated_policy() -> None:
+    """Apply the policy exported by the parent process, if any.
+
+    Called from `pytest_socket_policy.pth` as a child interpreter starts.
+    """
+    path = os.environ.get(_POLICY_ENV_VAR)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+        lines = raw.splitlines()
+        if len(lines) > 2:
+            _NO_SESSION.unix_socket_paths = _UnixSocketPaths.load(lines[2])
+        _set_policy(_load_policy(raw))
+
+
+def _install_guards(policy: _Policy, uninstall: bool) -> None:
+    """Patch `socket` with the guards `policy` needs.
+
+    The guards are shared by every policy and only ever look the active
+    one up, so patching is needed once rather than for every change.
+    """
+    socket_config = _session_config()
+    unix_socket_paths = socket_config.unix_socket_paths
+    if policy.block_sockets and not _audit_engine:
+        socket.socket = GuardedSocket  # type: ignore[misc]
+    elif uninstall:
+        socket.socket = _true_socket  # type: ignore[misc]
+
+    # Domain patterns need to see what names resolve to, and
+    # `--socket-filter-resolved` to change it, which an audit hook cannot.
+    if (policy.block_sockets and not _audit_engine) or (
+        policy.allowed_hosts is not None
+        and (policy.allowed_hosts.patterns or socket_config.filter_resolved is not None)
+    ):
+        socket.getaddrinfo = _guarded_getaddrinfo
+        socket.gethostbyname = _guarded_gethostbyname
+    elif uninstall:
+        if socket.getaddrinfo is _guarded_getaddrinfo:
+            socket.getaddrinfo = _true_getaddrinfo
+        if socket.gethostbyname is _guarded_gethostbyname:
+            socket.gethostbyname = _true_gethostbyname
+
+    # The audit hook can refuse a connect, but not bound how long it blocks.
+    if (
+        policy.allowed_hosts is not None
+        and (not _audit_engine or policy.allowed_hosts.connect_timeout is not None)
+    ) or (policy.block_sockets and not _audit_engine and unix_socket_paths is not None):
+        _true_socket.connect = _guarded_connect  # type: ignore[assignment,method-assign] # noqa E501
+    elif uninstall:
+        _true_socket.connect = _true_connect  # type: ignore[method-assign]
+
+    # Event loops resolve names in a thread pool, where the guards above
+    # only refuse once a worker thread picked the call up, and remember what
+    # domain patterns resolved to in the worker's context.
+    if policy.block_sockets or (
+        policy.allowed_hosts is not None and policy.allowed_hosts.patterns
+    ):
+        _patch_event_loops(_guarded_loop_getaddrinfo)
+    elif uninstall and _true_loop_getaddrinfo is not None:
+        _patch_event_loops(_true_loop_getaddrinfo)
+
+    # The other calls taking a destination are covered by audit events.
+    if not _audit_engine and (
+        policy.allowed_hosts is not None
+        or (policy.block_sockets and unix_socket_paths is not None)
+    ):
+        _true_socket.connect_ex = _guarded_connect_ex  # type: ignore[assignment,method-assign] # noqa E501
+        _true_socket.sendto = _guarded_sendto  # type: ignore[assignment,method-assign] # noqa E501
+        if _true_sendmsg is not None:
+            _true_socket.sendmsg = _guarded_sendmsg  # type: ignore[assignment,method-assign] # noqa E501
+    elif uninstall:
+        _true_socket.connect_ex = _true_connect_ex  # type: ignore[method-assign]
+        _true_socket.sendto = _true_sendto  # type: ignore[method-assign]
+        if _true_sendmsg is not None:
+            _true_socket.sendmsg = _true_sendmsg  # type: ignore[method-assign]
+
+
+def _patch_event_loops(getaddrinfo: Callable[..., Any]) -> None:
+    """Replace the `getaddrinfo()` of asyncio event loops, which
+    `create_connection()` and the like resolve host names with.
+
+    Only done once asyncio is imported, as importing it takes a while.
+    """
+    global _true_loop_getaddrinfo
+    base_events = sys.modules.get("asyncio.base_events")
+    if base_events is None:
+        return
+    loop_class = base_events.BaseEventLoop
+    if _true_loop_getaddrinfo is None:
+        _true_loop_getaddrinfo = loop_class.getaddrinfo
+    loop_class.getaddrinfo = getaddrinfo
+
+
+async def _guarded_loop_getaddrinfo(
+    loop: Any, host: Any, port: Any, **kwargs: Any
+) -> Any:
+    policy = _active_policy()
+    if policy.block_sockets:
+        _count_blocked_attempt(str(host))
+        raise SocketBlockedError("A test tried to use socket.getaddrinfo.")
+    result = await _true_loop_getaddrinfo(loop, host, port, **kwargs)
+    # Resolved in an executor thread, whose context the connect does not share.
+    _remember_pattern_addresses(policy, host, (str(addr[4][0]) for addr in result))
+    return result
+
+
+def _guarded_getaddrinfo(*args: Any, **kwargs: Any) -> Any:
+    policy = _active_policy()
+    host = args[0] if args else kwargs.get("host")
+    if policy.block_sockets:
+        _count_blocked_attempt(str(host))
+        raise SocketBlockedError("A test tried to use socket.getaddrinfo.")
+    result = _true_getaddrinfo(*args, **kwargs)
+    _remember_pattern_addresses(policy, host, (str(addr[4][0]) for addr in result))
+    filter_resolved = _session_config().filter_resolved
+    if filter_resolved is not None and policy.allowed_hosts is not None:
+        result = _filter_addresses(policy.allowed_hosts, result, filter_resolved)
+    return result
+
+
+def _filter_addresses(
+    allowed_hosts: _AllowedHosts, result: list[Any], filter_resolved: str
+) -> list[Any]:
+    """Keep the `getaddrinfo()` results a connect would be allowed to,
+    so clients trying each in turn do not stall on a blocked one.
+
+    When none is allowed, all are kept for the connect to fail with the
+    usual error rather than on an empty list.
+    """
+    allowed = [
+        info
+        for info in result
+        if (address := str(info[4][0])) in allowed_hosts.hosts
+        or address in _resolved_pattern_addresses(allowed_hosts)
+        or allowed_hosts.allows_address(address)
+        or (allowed_hosts.ports and allowed_hosts.allows_port(address, info[4][1]))
+    ]
+    if not allowed:
+        return result
+    family = _PREFERRED_FAMILIES.get(filter_resolved)
+    if family is not None:
+        allowed.sort(key=lambda info: info[0] != family)
+    return allowed
+
+
+def _guarded_gethostbyname(*args: Any, **kwargs: Any) -> Any:
+    policy = _active_policy()
+    host = args[0] if args else None
+    if policy.block_sockets:
+        _count_blocked_attempt(str(host))
+        raise SocketBlockedError("A test tried to use socket.gethostbyname.")
+    result = _true_gethostbyname(*args, **kwargs)
+    _remember_pattern_addresses(policy, host, [result])
+    return result
+
+
+class GuardedSocket(socket.socket):
+    """socket guard to disable socket creation (from pytest-socket)"""
+
+    def __new__(
+        cls,
+        family: socket.AddressFamily | int = -1,
+        type: socket.SocketKind | int = -1,
+        proto: int = -1,
+        fileno: int | None = None,
+    ) -> GuardedSocket:
+        policy = _active_policy()
+        if not policy.block_sockets or (
+            _is_unix_socket(family) and policy.allow_unix_socket
+        ):
+            return super().__new__(cls, family, type, proto, fileno)  # type: ignore[call-arg] # noqa E501
+
+        _count_blocked_attempt("socket.socket")
+        raise SocketBlockedError()
+
+
+def _is_local_listener(address: Any) -> bool:
+    tracker = _listener_tracker
+    return tracker is not None and tracker.allows(address)
+
+
+def _check_destination(
+    method: str, inst: socket.socket, address: Any
+) -> _AllowedHosts | None:
+    """Raise if the active policy does not let `method` reach `address`,
+    returning the allow-list that allowed it, if any."""
+    policy = _active_policy()
+    socket_config = _session_config()
+    unix_socket_paths = socket_config.unix_socket_paths
+    if unix_socket_paths is not None and _restricts_unix_sockets(policy, inst):
+        if unix_socket_paths.allows(address):
+            socket_config.destination_checks[method, True] += 1
+            return None
+        _block_destination(method, inst, unix_socket_paths.allowed_list, str(address))
+
+    allowed_hosts = policy.allowed_hosts
+    if allowed_hosts is None:
+        return None
+    host = host_from_address(address) if isinstance(address, tuple) else None
+    if allowed_hosts.allows(
+        inst, host, _port_from_address(address)
+    ) or _is_local_listener(address):
+        socket_config.destination_checks[method, True] += 1
+        return allowed_hosts
+    _block_destination(method, inst, allowed_hosts.allowed_list, host)
+
+
+def _block_destination(
+    method: str, inst: socket.socket, allowed: list[str], host: str | None
+) -> NoReturn:
+    _session_config().destination_checks[method, False] += 1
+    if method in ("connect", "connect_ex"):
+        # Close the real socket before raising. The blocking error is a
+        # RuntimeError, which bypasses callers' `except OSError` cleanup
+        # (e.g. socket.create_connection), so the fd would otherwise leak.
+        inst.close()
+    _count_blocked_attempt(str(host))
+    raise SocketConnectBlockedError(allowed, host, method=method)
+
+
+def _guarded_connect(inst: socket.socket, *args: Any) -> None:
+    allowed_hosts = _check_destination("connect", inst, args[0])
+    if not _audit_engine:
+        return _allowed_connect(inst, args, allowed_hosts)
+    # Keep the `socket.connect` audit event from checking it all over again.
+    token = _connect_checked.set(True)
+    try:
+        return _allowed_connect(inst, args, allowed_hosts)
+    finally:
+        _connect_checked.reset(token)
+
+
+def _allowed_connect(
+    inst: socket.socket, args: tuple[Any, ...], allowed_hosts: _AllowedHosts | None
+) -> None:
+    if allowed_hosts is None:
+        return _true_connect(inst, *args)
+    return _capped_connect(
+        inst, args, host_from_connect_args(args), allowed_hosts.connect_timeout
+    )
+
+
+def _guarded_connect_ex(inst: socket.socket, address: Any) -> int:
+    _check_destination("connect_ex", inst, address)
+    return _true_connect_ex(inst, address)
+
+
+def _guarded_sendto(inst: socket.socket, data: Any, *args: Any) -> int:
+    # `sendto(data, address)` or `sendto(data, flags, address)`.
+    if args:
+        _check_destination("sendto", inst, args[-1])
+    return _true_sendto(inst, data, *args)
+
+
+def _guarded_sendmsg(inst: socket.socket, buffers: Any, *args: Any) -> int:
+    # The address is the fourth argument, and omitted on connected sockets.
+    if len(args) > 2 and args[2] is not None:
+        _check_destination("sendmsg", inst, args[2])
+    # Only installed where `sendmsg()` exists.
+    return _true_sendmsg(inst, buffers, *args)  # type: ignore[misc]
+
+
+def _audit_socket_new(args: tuple[Any, ...]) -> None:
+    _, family, _, _ = args
+    policy = _active_policy()
+    if not policy.block_sockets or (
+        _is_unix_socket(family) and policy.allow_unix_socket
+    ):
+        return
+    _count_blocked_attempt("socket.socket")
+    raise SocketBlockedError()
+
+
+def _restricts_unix_sockets(policy: _Policy, inst: socket.socket) -> bool:
+    """Whether `policy` allows Unix sockets, which
+    `--allow-unix-socket-paths` then restricts to some paths."""
+    if not _is_unix_socket(inst.family):
+        return False
+    if policy.allowed_hosts is not None:
+        return policy.allowed_hosts.allow_unix_socket
+    return policy.block_sockets and policy.allow_unix_socket
+
+
+def _audit_connect(args: tuple[Any, ...]) -> None:
+    if not _connect_checked.get():
+        _check_destination("connect", *args)
+
 
-        def __new__(
-            cls,
-            family: socket.AddressFamily | int = -1,
-            type: socket.SocketKind | int = -1,
-            proto: int = -1,
-            fileno: int | None = None,
-        ) -> GuardedSocket:
-            if _is_unix_socket(family) and allow_unix_socket:
-                return super().__new__(cls, family, type, proto, fileno)  # type: ignore[call-arg] # noqa E501
+def _audit_sendto(args: tuple[Any, ...]) -> None:
+    _check_destination("sendto", *args)
 
-            raise SocketBlockedError()
 
-    socket.socket = GuardedSocket  # type: ignore[misc]
-    socket.getaddrinfo = _guarded_getaddrinfo
-    socket.gethostbyname = _guarded_gethostbyname
+def _audit_sendmsg(args: tuple[Any, ...]) -> None:
+    inst, address = args
+    if address is not None:
+        _check_destination("sendmsg", inst, address)
+
+
+def _audit_getaddrinfo(args: tuple[Any, ...]) -> None:
+    if _active_policy().block_sockets:
+        _count_blocked_attempt(str(args[0]))
+        raise SocketBlockedError("A test tried to use socket.getaddrinfo.")
+
+
+def _audit_gethostbyname(args: tuple[Any, ...]) -> None:
+    if _active_policy().block_sockets:
+        _count_blocked_attempt(str(args[0]))
+        raise SocketBlockedError("A test tried to use socket.gethostbyname.")
+
+
+# Set while the patched `connect()` connects to the destination it checked.
+_connect_checked: ContextVar[bool] = ContextVar(
+    "pytest_socket_connect_checked", default=False
+)
+
+
+# The guards of the audit engine, by the audit event CPython raises for
+# the call they guard. `socket.connect` is raised by `connect_ex()` too.
+_AUDIT_GUARDS = {
+    "socket.__new__": _audit_socket_new,
+    "socket.connect": _audit_connect,
+    "socket.sendto": _audit_sendto,
+    "socket.sendmsg": _audit_sendmsg,
+    "socket.getaddrinfo": _audit_getaddrinfo,
+    "socket.gethostbyname": _audit_gethostbyname,
+}
+
+
+def _set_engine(engine: str) -> None:
+    """Select how the guards are enforced, `"patch"` or `"audit"`."""
+    global _audit_engine
+    _audit_engine = engine == "audit"
+    if _audit_engine:
+        _install_audit_hook()
+
+
+def disable_socket(allow_unix_socket: bool = False) -> None:
+    """disable socket.socket to disable the Internet. useful in testing."""
+    _set_policy(
+        replace(
+            _active_policy(), block_sockets=True, allow_unix_socket=allow_unix_socket
+        )
+    )
 
 
 def enable_socket() -> None:
     """re-enable socket.socket to enable the Internet. useful in testing."""
-    socket.socket = _true_socket  # type: ignore[misc]
-    if socket.getaddrinfo is _guarded_getaddrinfo:
-        socket.getaddrinfo = _true_getaddrinfo
-    if socket.gethostbyname is _guarded_gethostbyname:
-        socket.gethostbyname = _true_gethostbyname
+    _set_policy(replace(_active_policy(), block_sockets=False, allow_unix_socket=False))
+
+
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_SIOCGIFFLAGS = 0x8913
+_SIOCSIFFLAGS = 0x8914
+_IFF_UP = 0x1
+# Set once the session entered its namespace, so the processes it starts,
+# such as pytest-xdist workers, know they already run inside it.
+_NETNS_ENV_VAR = "PYTEST_SOCKET_NETNS"
+
+
+def _unshare(flags: int) -> None:
+    if hasattr(os, "unshare"):  # Python 3.12+
+        os.unshare(flags)
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.unshare(flags) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def _enter_network_namespace() -> str | None:
+    """Move this process into new user and network namespaces, where the
+    kernel itself blocks any traffic beyond the loopback interface.
+
+    Returns why namespaces are unavailable, or None on success.
+    """
+    if os.environ.get(_NETNS_ENV_VAR):
+        return None
+    if not sys.platform.startswith("linux"):
+        return "network namespaces require Linux"
+
+    uid, gid = os.getuid(), os.getgid()
+    try:
+        # Creating a user namespace alongside lets unprivileged users own
+        # the network namespace. This fails once the process has threads.
+        _unshare(_CLONE_NEWUSER | _CLONE_NEWNET)
+    except OSError as exc:
+        return f"unshare() failed: {exc.strerror}"
+
+    # Past this point, the process is in the namespace for good. Should the
+    # rest fail, even the loopback interface is unusable, which falling back
+    # to `--disable-socket` reports rather than failing the session.
+
+    # Map our own ids, so files keep their ownership inside the namespace.
+    for path, content in (
+        ("/proc/self/setgroups", "deny"),
+        ("/proc/self/uid_map", f"{uid} {uid} 1"),
+        ("/proc/self/gid_map", f"{gid} {gid} 1"),
+    ):
+        try:
+            with open(path, "w") as f:
+                f.write(content)
+        except OSError as exc:
+            return f"writing {path} failed: {exc.strerror}"
+
+    # A new network namespace starts with its loopback interface down.
+    try:
+        with _true_socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            ifreq = struct.pack("16sh22x", b"lo", 0)
+            flags = struct.unpack("16sh22x", fcntl.ioctl(sock, _SIOCGIFFLAGS, ifreq))[1]
+            ifreq = struct.pack("16sh22x", b"lo", flags | _IFF_UP)
+            fcntl.ioctl(sock, _SIOCSIFFLAGS, ifreq)
+    except OSError as exc:
+        return f"bringing up the loopback interface failed: {exc.strerror}"
+
+    os.environ[_NETNS_ENV_VAR] = "1"
+    return None
 
 
 def pytest_configure(config: pytest.Config) -> None:
+    global _thread_tracker, _listener_tracker, _session_thread, _policy_file
+    _blocked_warnings.clear()
+    _session_thread = threading.current_thread()
+
     config.addinivalue_line(
         "markers", "disable_socket(): Disable socket connections for a specific test"
     )
@@ -163,13 +1849,93 @@ def pytest_configure(config: pytest.Config) -> None:
         "allow_hosts([hosts]): Restrict socket connection to defined list of hosts",
     )
 
+    allow_hosts = config.getoption("--allow-hosts")
+    allow_hosts_file = config.getoption("--allow-hosts-file")
+    if allow_hosts_file:
+        allow_hosts = (allow_hosts.split(",") if allow_hosts else []) + (
+            _read_allow_hosts_file(allow_hosts_file)
+        )
+
     # Store the global configs in the `pytest.Config` object.
-    config.stash[_STASH_KEY] = _PytestSocketConfig(
+    config.stash[_STASH_KEY] = socket_config = _PytestSocketConfig(
         socket_force_enabled=config.getoption("--force-enable-socket"),
         socket_disabled=config.getoption("--disable-socket"),
-        allow_unix_socket=config.getoption("--allow-unix-socket"),
-        allow_hosts=config.getoption("--allow-hosts"),
+        allow_unix_socket=bool(
+            config.getoption("--allow-unix-socket")
+            or config.getoption("--allow-unix-socket-paths")
+        ),
+        allow_hosts=allow_hosts,
+        connect_timeout=config.getoption("--socket-connect-timeout"),
+        allow_loopback=config.getoption("--allow-loopback"),
+        max_blocked_attempts=config.getoption("--socket-max-blocked-attempts"),
+        filter_resolved=config.getoption("--socket-filter-resolved"),
     )
+    if config.getoption("--socket-lazy-resolution"):
+        socket_config.lazy_resolver = _ResolutionCache(
+            ttl=config.getoption("--socket-resolution-ttl")
+        )
+    unix_socket_paths = config.getoption("--allow-unix-socket-paths")
+    if unix_socket_paths:
+        socket_config.unix_socket_paths = _UnixSocketPaths(unix_socket_paths.split(","))
+    _session_configs.append(socket_config)
+    if config.getoption("--socket-netns"):
+        _configure_netns(socket_config)
+    _set_engine(config.getoption("--socket-engine"))
+    if config.getoption("--socket-propagate"):
+        fd, _policy_file = tempfile.mkstemp(prefix="pytest-socket-policy-")
+        os.close(fd)
+
+    track_leaks = config.getoption("--socket-track-leaks")
+    if track_leaks:
+        config.pluginmanager.register(
+            _SocketLeakTracker(fail=track_leaks == "fail"), "socket_leak_tracker"
+        )
+
+    if config.getoption("--allow-local-listeners"):
+        _listener_tracker = _ListenerTracker()
+        config.pluginmanager.register(_listener_tracker, "socket_listener_tracker")
+
+    if config.getoption("--socket-track-threads"):
+        _thread_tracker = _ThreadTracker()
+        config.pluginmanager.register(_thread_tracker, "socket_thread_tracker")
+        _install_audit_hook()
+
+
+def _configure_netns(socket_config: _PytestSocketConfig) -> None:
+    reason = _enter_network_namespace()
+    if reason is None:
+        # The kernel blocks the network for every test, so there is no need
+        # to patch `socket` for a session-wide `--disable-socket`.
+        socket_config.netns = True
+        socket_config.socket_disabled = False
+    else:
+        socket_config.netns_unavailable = reason
+        socket_config.socket_disabled = True
+
+
+def pytest_report_header(config: pytest.Config) -> str | None:
+    socket_config = config.stash[_STASH_KEY]
+    if socket_config.netns:
+        return "socket: network namespace with loopback only"
+    if socket_config.netns_unavailable:
+        return (
+            f"socket: network namespace unavailable ({socket_config.netns_unavailable})"
+            ", falling back to --disable-socket"
+        )
+    return None
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    global _policy_file
+    socket_config = config.stash.get(_STASH_KEY, None)
+    if socket_config in _session_configs:
+        _session_configs.remove(socket_config)
+    _set_engine("patch")
+    if _policy_file is not None:
+        os.environ.pop(_POLICY_ENV_VAR, None)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(_policy_file)
+        _policy_file = None
 
 
 def pytest_runtest_setup(item: pytest.Item) -> None:
@@ -183,9 +1949,12 @@ def pytest_runtest_setup(item: pytest.Item) -> None:
     If the given item is not a function test (i.e a DoctestItem)
     or otherwise has no support for fixtures, skip it.
     """
+    global _current_test
     if not hasattr(item, "fixturenames"):
         return
 
+    _current_test = item.nodeid
+
     socket_config = item.config.stash[_STASH_KEY]
 
     # If test has the `enable_socket` marker, fixture or
@@ -209,7 +1978,7 @@ def pytest_runtest_setup(item: pytest.Item) -> None:
     hosts = _resolve_allow_hosts(item)
 
     # Finally, check the global config and disable socket if needed.
-    if socket_config.socket_disabled and not hosts:
+    if socket_config.socket_disabled and not hosts and not socket_config.allow_loopback:
         disable_socket(socket_config.allow_unix_socket)
 
 
@@ -220,21 +1989,138 @@ def _resolve_allow_hosts(item: pytest.Item) -> str | list[str] | None:
     mark_restrictions = item.get_closest_marker("allow_hosts")
     cli_restrictions = socket_config.allow_hosts
     hosts = None
+    connect_timeout = socket_config.connect_timeout
     if mark_restrictions:
-        hosts = mark_restrictions.args[0]
+        hosts = (
+            mark_restrictions.args[0] if mark_restrictions.args else cli_restrictions
+        )
+        connect_timeout = mark_restrictions.kwargs.get(
+            "connect_timeout", connect_timeout
+        )
     elif cli_restrictions:
         hosts = cli_restrictions
 
-    socket_allow_hosts(
-        hosts,
-        allow_unix_socket=socket_config.allow_unix_socket,
-        resolution_cache=socket_config.resolution_cache,
-    )
+    if hosts is None and socket_config.allow_loopback:
+        hosts = []
+
+    # Most tests share the same allow-list, which may be huge when read from
+    # a file, so it is only compiled once, and looked up by identity rather
+    # than content. Per-test allow-lists are forgotten again, least recently
+    # used first, as they pile up.
+    hosts_key: Any = _CLI_ALLOW_HOSTS
+    if hosts is not cli_restrictions:
+        hosts_key = hosts if isinstance(hosts, str) else tuple(hosts or ())
+    key = (hosts_key, connect_timeout)
+    compiled = socket_config.compiled_allow_hosts
+    if key in compiled:
+        compiled.move_to_end(key)
+    else:
+        if len(compiled) >= _COMPILED_ALLOW_HOSTS_SIZE:
+            compiled.popitem(last=False)
+        compiled[key] = _compile_allowed_hosts(
+            hosts,
+            socket_config.allow_unix_socket,
+            socket_config.lazy_resolver or socket_config.resolution_cache,
+            connect_timeout,
+            lazy=socket_config.lazy_resolver is not None,
+            loopback=socket_config.allow_loopback,
+        )
+    allowed_hosts = compiled[key]
+    if allowed_hosts is not None:
+        _set_policy(replace(_active_policy(), allowed_hosts=allowed_hosts))
     return hosts
 
 
-def pytest_runtest_teardown() -> None:
+def _read_allow_hosts_file(path: str) -> list[str]:
+    """Read an allow-list file, dropping duplicates and collapsing the
+    addresses and networks into as few networks as possible."""
+    hosts: set[str] = set()
+    ipv4: list[ipaddress.IPv4Network] = []
+    ipv6: list[ipaddress.IPv6Network] = []
+    try:
+        with open(path) as f:
+            for line in f:
+                for entry in line.split("#", 1)[0].split(","):
+                    entry = entry.strip()
+                    if not entry:
+                        continue
+                    try:
+                        net = ipaddress.ip_network(entry, strict=False)
+                    except ValueError:
+                        hosts.add(entry)
+                        continue
+                    if isinstance(net, ipaddress.IPv4Network):
+                        ipv4.append(net)
+                    else:
+                        ipv6.append(net)
+    except OSError as exc:
+        raise pytest.UsageError(
+            f"Could not read --allow-hosts-file: {exc.strerror} ({path})"
+        ) from exc
+
+    collapsed: list[_IPNetwork] = [
+        *ipaddress.collapse_addresses(ipv4),
+        *ipaddress.collapse_addresses(ipv6),
+    ]
+    # Single addresses stay plain, as those are matched by a set lookup.
+    return sorted(hosts) + [
+        str(net.network_address if net.prefixlen == net.max_prefixlen else net)
+        for net in collapsed
+    ]
+
+
+def pytest_runtest_teardown(item: pytest.Item) -> None:
+    global _current_test
     _remove_restrictions()
+    _keep_repeated_blocked_calls(item.config.stash[_STASH_KEY])
+    _blocked_attempts.set(None)
+    _pattern_addresses.set(None)
+    _current_test = None
+
+
+def pytest_terminal_summary(terminalreporter: Any, config: pytest.Config) -> None:
+    socket_config = config.stash.get(_STASH_KEY, None)
+    if socket_config is not None:
+        caches = [("allow-list", socket_config.resolution_cache)]
+        if socket_config.lazy_resolver is not None:
+            caches.append(("lazy", socket_config.lazy_resolver))
+        if any(cache.hits or cache.misses for _, cache in caches):
+            terminalreporter.write_sep("-", "pytest-socket host name resolution")
+            for name, cache in caches:
+                terminalreporter.write_line(f"{name}: {cache.summary()}")
+
+    if socket_config is None:
+        return
+
+    destination_checks = socket_config.destination_checks
+    blocked_methods = sorted(
+        {method for (method, allowed) in destination_checks if not allowed}
+    )
+    if blocked_methods:
+        terminalreporter.write_sep("-", "pytest-socket destination checks")
+        for method in blocked_methods:
+            terminalreporter.write_line(
+                f"{method}(): {destination_checks[method, True]} allowed, "
+                f"{destination_checks[method, False]} blocked"
+            )
+
+    # Calls outside of tests are only counted so far.
+    _keep_repeated_blocked_calls(socket_config)
+    repeated = socket_config.repeated_blocked_calls.most_common()
+    if not repeated:
+        return
+    terminalreporter.write_sep("-", "pytest-socket repeated blocked calls")
+    for (nodeid, filename, lineno, destination), count in repeated[
+        :_REPEATED_SUMMARY_LIMIT
+    ]:
+        terminalreporter.write_line(
+            f'{nodeid or "(outside of a test)"} {filename}:{lineno} '
+            f'"{destination}": {count} calls, warned once'
+        )
+    if len(repeated) > _REPEATED_SUMMARY_LIMIT:
+        terminalreporter.write_line(
+            f"... and {len(repeated) - _REPEATED_SUMMARY_LIMIT} more"
+        )
 
 
 def host_from_address(address: tuple[Any, ...]) -> str | None:
@@ -264,10 +2150,12 @@ def is_ipaddress(address: str) -> bool:
 
 
 def resolve_hostnames(hostname: str) -> set[str]:
+    # The unpatched `getaddrinfo()`, as the guards may resolve allowed host
+    # names themselves, and their results are shared by every allow-list.
     try:
         return {
             addr_struct[0]  # type: ignore[misc]
-            for *_, addr_struct in socket.getaddrinfo(hostname, None)
+            for *_, addr_struct in _true_getaddrinfo(hostname, None)
         }
     except socket.gaierror:
         return set()
@@ -275,7 +2163,7 @@ def resolve_hostnames(hostname: str) -> set[str]:
 
 def normalize_allowed_hosts(
     allowed_hosts: list[str],
-    resolution_cache: dict[str, set[str]] | None = None,
+    resolution_cache: dict[str, set[str]] | _ResolutionCache | None = None,
 ) -> dict[str, set[str]]:
     """Map all items in `allowed_hosts` to IP addresses."""
     if resolution_cache is None:
@@ -286,6 +2174,9 @@ def normalize_allowed_hosts(
         if is_ipaddress(host):
             ip_hosts[host].add(host)
             continue
+        if isinstance(resolution_cache, _ResolutionCache):
+            ip_hosts[host].update(resolution_cache.resolve(host))
+            continue
         if host not in resolution_cache:
             resolution_cache[host] = resolve_hostnames(host)
         ip_hosts[host].update(resolution_cache[host])
@@ -316,21 +2207,167 @@ def _partition_allowed(
     return plain_hosts, networks
 
 
+def _capped_connect(
+    inst: socket.socket,
+    args: tuple[Any, ...],
+    host: str | None,
+    timeout: float | None,
+) -> None:
+    """Connect to an allowed host, blocking for at most `timeout` seconds.
+
+    The socket's own timeout is restored afterwards, so the cap only
+    applies to the connect itself. Sockets that already time out sooner,
+    including non-blocking ones, are left alone.
+    """
+    user_timeout = inst.gettimeout()
+    if timeout is None or (user_timeout is not None and user_timeout <= timeout):
+        return _true_connect(inst, *args)
+
+    inst.settimeout(timeout)
+    try:
+        return _true_connect(inst, *args)
+    except TimeoutError as exc:
+        raise SocketConnectTimeoutError(host, timeout) from exc
+    finally:
+        inst.settimeout(user_timeout)
+
+
 def socket_allow_hosts(
     allowed: str | list[str] | None = None,
     allow_unix_socket: bool = False,
-    resolution_cache: dict[str, set[str]] | None = None,
+    resolution_cache: dict[str, set[str]] | _ResolutionCache | None = None,
+    connect_timeout: float | None = None,
 ) -> None:
     """disable socket.socket.connect() to disable the Internet. useful in testing."""
+    if resolution_cache is None:
+        resolution_cache = _ResolutionCache()
+    allowed_hosts = _compile_allowed_hosts(
+        allowed, allow_unix_socket, resolution_cache, connect_timeout
+    )
+    if allowed_hosts is not None:
+        _set_policy(replace(_active_policy(), allowed_hosts=allowed_hosts))
+
+
+def _compile_allowed_hosts(
+    allowed: str | list[str] | None,
+    allow_unix_socket: bool,
+    resolution_cache: dict[str, set[str]] | _ResolutionCache | None,
+    connect_timeout: float | None,
+    lazy: bool = False,
+    loopback: bool = False,
+) -> _AllowedHosts | None:
+    """Compile an allow-list. Host names are resolved through
+    `resolution_cache`, unless `lazy` defers that until a connect needs
+    them, which requires a `_ResolutionCache`."""
     if isinstance(allowed, str):
         allowed = allowed.split(",")
 
     if not isinstance(allowed, list):
-        return
+        return None
 
+    allowed, ports = _partition_ports(allowed, resolution_cache)
     plain_hosts, networks = _partition_allowed(allowed)
+    plain_hosts, patterns = _partition_patterns(plain_hosts)
+    resolver = (
+        resolution_cache if isinstance(resolution_cache, _ResolutionCache) else None
+    )
+    if not lazy:
+        addresses = dict(normalize_allowed_hosts(plain_hosts, resolution_cache))
+    else:
+        # Host names are left without addresses, for `resolver` to look
+        # them up only once a connect needs them.
+        addresses = dict(
+            normalize_allowed_hosts([h for h in plain_hosts if is_ipaddress(h)])
+        )
+        addresses.update(
+            (host.strip(), set()) for host in plain_hosts if not is_ipaddress(host)
+        )
+
+    return _build_allowed_hosts(
+        addresses,
+        networks,
+        allow_unix_socket,
+        connect_timeout,
+        patterns,
+        resolver,
+        lazy=lazy,
+        loopback=loopback,
+        ports=ports,
+    )
 
-    allowed_ip_hosts_by_host = normalize_allowed_hosts(plain_hosts, resolution_cache)
+
+def _partition_ports(
+    allowed: list[str],
+    resolution_cache: dict[str, set[str]] | _ResolutionCache | None = None,
+) -> tuple[list[str], list[_PortRule]]:
+    """Split the entries restricted to some ports out of an allow-list.
+
+    Host names in those are resolved up front. Entries whose port does
+    not parse are left as plain hosts, like invalid CIDR entries.
+    """
+    plain_hosts: list[str] = []
+    rules: list[_PortRule] = []
+    for entry in allowed:
+        entry = entry.strip()
+        rule = _parse_port_rule(entry, resolution_cache)
+        if rule is None:
+            plain_hosts.append(entry)
+        else:
+            rules.append(rule)
+    return plain_hosts, rules
+
+
+def _parse_port_rule(
+    entry: str,
+    resolution_cache: dict[str, set[str]] | _ResolutionCache | None,
+) -> _PortRule | None:
+    if entry.startswith("["):
+        host, sep, ports = entry[1:].partition("]:")
+    elif entry.count(":") == 1:
+        host, sep, ports = entry.partition(":")
+    else:
+        return None
+    low, dash, high = ports.partition("-")
+    if not sep or not low.isdigit() or (dash and not high.isdigit()):
+        return None
+    low_port = int(low)
+    high_port = int(high) if dash else low_port
+    if not low_port <= high_port <= 65535:
+        return None
+
+    if "/" in host:
+        try:
+            network = ipaddress.ip_network(host, strict=False)
+        except ValueError:
+            return None
+        return _PortRule(entry, frozenset(), (network,), low_port, high_port)
+    addresses = normalize_allowed_hosts([host], resolution_cache)[host]
+    return _PortRule(entry, frozenset({host, *addresses}), (), low_port, high_port)
+
+
+def _partition_patterns(hosts: list[str]) -> tuple[list[str], list[str]]:
+    """Split plain hosts into host names and domain patterns, which start
+    with `*.` or `.` and match any subdomain."""
+    plain_hosts: list[str] = []
+    patterns: list[str] = []
+    for host in hosts:
+        (patterns if host.startswith(("*.", ".")) else plain_hosts).append(host)
+    return plain_hosts, patterns
+
+
+def _build_allowed_hosts(
+    allowed_ip_hosts_by_host: dict[str, set[str]],
+    networks: list[_IPNetwork],
+    allow_unix_socket: bool,
+    connect_timeout: float | None,
+    patterns: list[str] | None = None,
+    resolver: _ResolutionCache | None = None,
+    lazy: bool = False,
+    loopback: bool = False,
+    ports: list[_PortRule] | None = None,
+) -> _AllowedHosts:
+    patterns = patterns or []
+    ports = ports or []
     allowed_ip_hosts_and_hostnames = set(
         itertools.chain(*allowed_ip_hosts_by_host.values())
     ) | set(allowed_ip_hosts_by_host.keys())
@@ -338,40 +2375,98 @@ def socket_allow_hosts(
         [
             (
                 host
-                if len(normalized) == 1 and next(iter(normalized)) == host
+                if not normalized
+                or (len(normalized) == 1 and next(iter(normalized)) == host)
                 else f"{host} ({','.join(sorted(normalized))})"
             )
             for host, normalized in allowed_ip_hosts_by_host.items()
         ]
         + [str(net) for net in networks]
+        + patterns
+        + [rule.entry for rule in ports]
+        + (["loopback"] if loopback else [])
     )
 
-    def guarded_connect(inst: socket.socket, *args: Any) -> None:
-        host = host_from_connect_args(args)
-        if host in allowed_ip_hosts_and_hostnames or (
-            _is_unix_socket(inst.family) and allow_unix_socket
-        ):
-            return _true_connect(inst, *args)
-
-        if host and networks and is_ipaddress(host):
-            ip = ipaddress.ip_address(host)
-            if any(ip in net for net in networks):
-                return _true_connect(inst, *args)
-
-        # Close the real socket before raising. The blocking error is a
-        # RuntimeError, which bypasses callers' `except OSError` cleanup
-        # (e.g. socket.create_connection), so the fd would otherwise leak.
-        inst.close()
-        raise SocketConnectBlockedError(allowed_list, host)
-
-    socket.socket.connect = guarded_connect  # type: ignore[assignment,method-assign]
+    return _AllowedHosts(
+        hosts=frozenset(allowed_ip_hosts_and_hostnames),
+        networks=tuple(networks),
+        allowed_list=allowed_list,
+        allow_unix_socket=allow_unix_socket,
+        connect_timeout=connect_timeout,
+        addresses=allowed_ip_hosts_by_host,
+        patterns=tuple(patterns),
+        unresolved=tuple(
+            host
+            for host, normalized in allowed_ip_hosts_by_host.items()
+            if not normalized and lazy
+        ),
+        resolver=resolver,
+        loopback=loopback,
+        ports=tuple(ports),
+    )
 
 
 def _remove_restrictions() -> None:
     """restore socket.socket.* to allow access to the Internet. useful in testing."""
-    socket.socket = _true_socket  # type: ignore[misc]
-    socket.socket.connect = _true_connect  # type: ignore[method-assign]
-    if socket.getaddrinfo is _guarded_getaddrinfo:
-        socket.getaddrinfo = _true_getaddrinfo
-    if socket.gethostbyname is _guarded_gethostbyname:
-        socket.gethostbyname = _true_gethostbyname
+    _set_policy(_UNRESTRICTED)
+
+
+class _PolicyContext:
+    """Apply a compiled policy for the duration of a `with` block or of
+    the decorated function, then restore the one it replaced."""
+
+    def __init__(self, policy: _Policy) -> None:
+        self._policy = policy
+        # None for threads that followed the process-wide policy, and go
+        # back to following it.
+        self._previous: list[_Policy | None] = []
+
+    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        def with_policy(*args: Any, **kwargs: Any) -> Any:
+            # Each call gets its own instance, so calls from concurrent
+            # threads restore their own previous policy.
+            with _PolicyContext(self._policy):
+                return func(*args, **kwargs)
+
+        return with_policy
+
+    def __enter__(self) -> None:
+        if _in_session_thread():
+            self._previous.append(_process_policy)
+        else:
+            self._previous.append(_context_policy.get())
+        _set_policy(self._policy)
+
+    def __exit__(self, *_exc_info: Any) -> None:
+        previous = self._previous.pop()
+        if previous is None:
+            _set_context_policy(None)
+        else:
+            _set_policy(previous)
+
+
+def policy(
+    *,
+    disable_socket: bool = False,
+    allow_unix_socket: bool = False,
+    allow_hosts: str | list[str] | None = None,
+    connect_timeout: float | None = None,
+) -> _PolicyContext:
+    """Restrict sockets within a `with` block or a decorated function.
+
+    The restrictions replace the current ones and are compiled once, with
+    host names resolved up front, however many times the block is entered:
+
+        with pytest_socket.policy(allow_hosts=["127.0.0.1"]):
+            ...
+    """
+    return _PolicyContext(
+        _Policy(
+            block_sockets=disable_socket,
+            allow_unix_socket=allow_unix_socket,
+            allowed_hosts=_compile_allowed_hosts(
+                allow_hosts, allow_unix_socket, _ResolutionCache(), connect_timeout
+            ),
+        )
+    )
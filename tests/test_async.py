@@ -1,3 +1,11 @@
+import asyncio
+
+import httpx
+import pytest
+
+import pytest_socket
+from pytest_socket import SocketBlockedError, disable_socket, enable_socket
+
 from .common import assert_socket_blocked
 from .conftest import unix_sockets_only
 
@@ -46,3 +54,123 @@ def test_httpx_fails(pytester):
         """)
     result = pytester.runpytest("--disable-socket", "--allow-unix-socket")
     assert_socket_blocked(result)
+
+
+@unix_sockets_only
+def test_loop_getaddrinfo_fails_without_executor(pytester):
+    pytester.makepyfile("""
+        import asyncio
+
+        import pytest
+        from pytest_socket import SocketBlockedError
+
+        async def resolve():
+            loop = asyncio.get_running_loop()
+            with pytest.raises(SocketBlockedError):
+                await loop.getaddrinfo("www.example.com", 80)
+            with pytest.raises(SocketBlockedError):
+                await asyncio.open_connection("www.example.com", 80)
+            # Nothing was handed to the default thread pool.
+            assert loop._default_executor is None
+
+        def test_resolve():
+            asyncio.run(resolve())
+        """)
+    result = pytester.runpytest("--disable-socket", "--allow-unix-socket")
+    result.assert_outcomes(passed=1)
+
+
+@unix_sockets_only
+def test_loop_getaddrinfo_restored(pytester):
+    pytester.makepyfile("""
+        import asyncio
+
+        def test_resolve(socket_enabled):
+            async def resolve():
+                loop = asyncio.get_running_loop()
+                return await loop.getaddrinfo("127.0.0.1", 80)
+
+            assert asyncio.run(resolve())
+        """)
+    result = pytester.runpytest("--disable-socket", "--allow-unix-socket")
+    result.assert_outcomes(passed=1)
+
+
+def test_loop_getaddrinfo_allows_domain_pattern(pytester):
+    pytester.makepyfile("""
+        import asyncio
+
+        import pytest
+        import pytest_socket
+        from pytest_socket import SocketConnectBlockedError
+
+        @pytest.fixture(autouse=True)
+        def fake_dns(monkeypatch):
+            true_getaddrinfo = pytest_socket._true_getaddrinfo
+
+            def getaddrinfo(host, port, *args, **kwargs):
+                if host.startswith("api."):
+                    host = "127.0.0.1"
+                return true_getaddrinfo(host, port, *args, **kwargs)
+
+            monkeypatch.setattr(pytest_socket, "_true_getaddrinfo", getaddrinfo)
+
+        async def connect(host):
+            server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1")
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                _, writer = await asyncio.open_connection(host, port)
+                writer.close()
+                await writer.wait_closed()
+
+        def test_matching_name():
+            asyncio.run(connect("api.svc.cluster.local"))
+
+        def test_other_name():
+            with pytest.raises(SocketConnectBlockedError):
+                asyncio.run(connect("api.svc.other.local"))
+        """)
+    result = pytester.runpytest("--allow-hosts=*.svc.cluster.local")
+    result.assert_outcomes(passed=2)
+
+
+@unix_sockets_only
+@pytest.mark.parametrize("blocked_in", ["event_loop", "thread_pool"])
+def test_bench_loop_getaddrinfo_blocked(benchmark, blocked_in):
+    loop = asyncio.new_event_loop()
+
+    async def resolve():
+        with pytest.raises(SocketBlockedError):
+            await loop.getaddrinfo("www.example.com", 80)
+
+    disable_socket(allow_unix_socket=True)
+    if blocked_in == "thread_pool":
+        # The baseline: only `socket.getaddrinfo()` in the default thread pool
+        # refuses the lookup, as before event loops were patched.
+        pytest_socket._patch_event_loops(pytest_socket._true_loop_getaddrinfo)
+    try:
+        benchmark(lambda: loop.run_until_complete(resolve()))
+    finally:
+        enable_socket()
+        loop.close()
+
+
+@unix_sockets_only
+@pytest.mark.parametrize("blocked_in", ["event_loop", "thread_pool"])
+def test_bench_httpx_request_blocked(benchmark, blocked_in):
+    """A blocked request through the httpx client, as in `test_httpx_fails`."""
+    loop = asyncio.new_event_loop()
+
+    async def request():
+        async with httpx.AsyncClient() as client:
+            with pytest.raises(SocketBlockedError):
+                await client.get("http://www.example.com/")
+
+    disable_socket(allow_unix_socket=True)
+    if blocked_in == "thread_pool":
+        pytest_socket._patch_event_loops(pytest_socket._true_loop_getaddrinfo)
+    try:
+        benchmark(lambda: loop.run_until_complete(request()))
+    finally:
+        enable_socket()
+        loop.close()
@@ -0,0 +1,161 @@
+"""Tests for enforcing the restrictions from an audit hook."""
+
+import pytest
+
+import pytest_socket
+
+from .common import assert_socket_blocked
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-engine={patch,audit}",
+        ]
+    )
+
+
+def test_audit_engine_blocks_socket_without_patching(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def test_socket():
+            assert socket.socket.__module__ == "socket"
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        """)
+    result = pytester.runpytest("--disable-socket", "--socket-engine=audit")
+    assert_socket_blocked(result)
+
+
+def test_audit_engine_blocks_captured_socket_class(pytester):
+    pytester.makepyfile("""
+        import _socket
+
+        def test_socket():
+            _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+        """)
+    result = pytester.runpytest("--disable-socket", "--socket-engine=audit")
+    assert_socket_blocked(result)
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        "socket.getaddrinfo('localhost', 80)",
+        "socket.gethostbyname('localhost')",
+    ],
+)
+def test_audit_engine_blocks_name_resolution(pytester, call):
+    pytester.makepyfile(f"""
+        import socket
+
+        def test_resolve():
+            {call}
+        """)
+    result = pytester.runpytest("--disable-socket", "--socket-engine=audit")
+    assert_socket_blocked(result)
+
+
+def test_audit_engine_allows_unix_socket(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def test_unix():
+            socket.socket(socket.AF_UNIX, socket.SOCK_STREAM).close()
+        """)
+    result = pytester.runpytest(
+        "--disable-socket", "--allow-unix-socket", "--socket-engine=audit"
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_audit_engine_enable_socket_marker(pytester):
+    pytester.makepyfile("""
+        import pytest
+        import socket
+
+        @pytest.mark.enable_socket
+        def test_enabled():
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM).close()
+        """)
+    result = pytester.runpytest("--disable-socket", "--socket-engine=audit")
+    result.assert_outcomes(passed=1)
+
+
+def test_audit_engine_restricts_connect(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import pytest
+        import socket
+
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_allowed():
+            socket.create_connection(("{httpserver.host}", {httpserver.port})).close()
+
+        def test_blocked():
+            with socket.socket() as sock:
+                with pytest.raises(SocketConnectBlockedError):
+                    sock.connect(("127.0.0.2", {httpserver.port}))
+                assert sock.fileno() == -1
+
+        def test_blocked_connect_ex():
+            with socket.socket() as sock:
+                with pytest.raises(SocketConnectBlockedError):
+                    sock.connect_ex(("127.0.0.2", {httpserver.port}))
+        """)
+    result = pytester.runpytest(
+        f"--allow-hosts={httpserver.host}", "--socket-engine=audit"
+    )
+    result.assert_outcomes(passed=3)
+
+
+def test_audit_engine_caps_connect_time(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import socket
+
+        def test_connect():
+            with socket.socket() as sock:
+                sock.connect(("{httpserver.host}", {httpserver.port}))
+                assert sock.gettimeout() is None
+        """)
+    result = pytester.runpytest(
+        f"--allow-hosts={httpserver.host}",
+        "--socket-connect-timeout=5",
+        "--socket-engine=audit",
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_audit_engine_counts_capped_connects_once(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_connect():
+            with socket.socket() as sock:
+                sock.connect(("{httpserver.host}", {httpserver.port}))
+            with socket.socket() as sock:
+                with pytest.raises(SocketConnectBlockedError):
+                    sock.connect(("127.0.0.2", {httpserver.port}))
+        """)
+    result = pytester.runpytest(
+        f"--allow-hosts={httpserver.host}",
+        "--socket-connect-timeout=5",
+        "--socket-engine=audit",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["connect(): 1 allowed, 1 blocked"])
+
+
+def test_audit_engine_off_after_session(pytester):
+    pytester.makepyfile("""
+        def test_nothing():
+            pass
+        """)
+    result = pytester.runpytest("--disable-socket", "--socket-engine=audit")
+    result.assert_outcomes(passed=1)
+    assert not pytest_socket._audit_engine
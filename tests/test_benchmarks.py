@@ -2,19 +2,42 @@
 Performance benchmarks for pytest-socket.
 
 These benchmarks track the performance of the core utility functions
-used by the plugin to resolve, validate, and partition host allow-lists.
+used by the plugin to resolve, validate, and partition host allow-lists,
+of the guards enforcing the restrictions, and the memory the restrictions
+retain over long sessions.
 """
 
 from __future__ import annotations
 
+import functools
+import gc
+import socket
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+import pytest_socket
 from pytest_socket import (
+    _COMPILED_ALLOW_HOSTS_SIZE,
+    _STASH_KEY,
+    _compile_allowed_hosts,
+    _DomainTrie,
+    _ListenerTracker,
     _partition_allowed,
+    _PytestSocketConfig,
+    _remove_restrictions,
+    _ResolutionCache,
+    _resolve_allow_hosts,
+    _set_engine,
     disable_socket,
     enable_socket,
     host_from_address,
     host_from_connect_args,
     is_ipaddress,
     normalize_allowed_hosts,
+    policy,
+    socket_allow_hosts,
 )
 
 # ---------------------------------------------------------------------------
@@ -111,3 +134,301 @@ def test_bench_disable_enable_socket(benchmark):
     benchmark(_disable_enable_cycle)
     # Ensure socket is restored after benchmark
     enable_socket()
+
+
+# ---------------------------------------------------------------------------
+# Resolution cache memory over a long session
+# ---------------------------------------------------------------------------
+
+
+def test_bench_resolution_cache_memory_flat(benchmark, monkeypatch):
+    """Allowing a new host name in each of 100k tests, as parametrized
+    per-tenant subdomains do, keeps memory flat once the caches are full."""
+    monkeypatch.setattr(pytest_socket, "resolve_hostnames", lambda _: {"10.0.0.1"})
+    socket_config = _PytestSocketConfig(
+        socket_disabled=False,
+        socket_force_enabled=False,
+        allow_unix_socket=False,
+        allow_hosts=None,
+        connect_timeout=None,
+        resolution_cache=_ResolutionCache(maxsize=1024),
+    )
+    config = SimpleNamespace(stash={_STASH_KEY: socket_config})
+
+    def _item(i):
+        marker = pytest.mark.allow_hosts([f"tenant{i}.example.test"]).mark
+        return SimpleNamespace(config=config, get_closest_marker=lambda _: marker)
+
+    def _session():
+        tracemalloc.start()
+        try:
+            for i in range(100_000):
+                _resolve_allow_hosts(_item(i))
+                if i == 10_000:
+                    warm, _ = tracemalloc.get_traced_memory()
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            _remove_restrictions()
+        return current - warm
+
+    growth = benchmark.pedantic(_session, rounds=1, iterations=1)
+    assert growth < 64 * 1024
+    assert len(socket_config.resolution_cache) == 1024
+    assert len(socket_config.compiled_allow_hosts) == _COMPILED_ALLOW_HOSTS_SIZE
+
+
+def test_bench_resolve_allow_hosts_file_per_test(benchmark):
+    """Setting up a test under a 20k entry `--allow-hosts-file` reuses the
+    compiled allow-list without going through its entries again."""
+    allow_hosts = [f"10.{i // 256}.{i % 256}.1" for i in range(20_000)]
+    socket_config = _PytestSocketConfig(
+        socket_disabled=False,
+        socket_force_enabled=False,
+        allow_unix_socket=False,
+        allow_hosts=allow_hosts,
+        connect_timeout=None,
+    )
+    item = SimpleNamespace(
+        config=SimpleNamespace(stash={_STASH_KEY: socket_config}),
+        get_closest_marker=lambda _: None,
+    )
+    try:
+        benchmark(_resolve_allow_hosts, item)
+    finally:
+        _remove_restrictions()
+    assert list(socket_config.compiled_allow_hosts) == [
+        (pytest_socket._CLI_ALLOW_HOSTS, None)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Domain pattern matching
+# ---------------------------------------------------------------------------
+
+
+def test_bench_domain_trie_match(benchmark):
+    trie = _DomainTrie([f"*.svc{i}.cluster.local" for i in range(500)])
+    benchmark(trie.matches, "api.svc499.cluster.local")
+
+
+def test_bench_domain_trie_miss(benchmark):
+    trie = _DomainTrie([f"*.svc{i}.cluster.local" for i in range(500)])
+    benchmark(trie.matches, "api.example.com")
+
+
+# ---------------------------------------------------------------------------
+# Host names passed to connect(), and loopback addresses
+# ---------------------------------------------------------------------------
+
+
+def test_bench_allows_host_name_memoized(benchmark):
+    allowed = _compile_allowed_hosts(
+        ["127.0.0.1", "10.0.0.0/8"], False, _ResolutionCache(), None
+    )
+    assert allowed is not None
+    with socket.socket() as inst:
+        allowed.allows(inst, "localhost")
+        benchmark(allowed.allows, inst, "localhost")
+
+
+def test_bench_allows_loopback_generic(benchmark):
+    allowed = _compile_allowed_hosts(["127.0.0.0/8", "::1"], False, None, None)
+    assert allowed is not None
+    with socket.socket() as inst:
+        benchmark(allowed.allows, inst, "127.0.0.2")
+
+
+def test_bench_allows_loopback_preset(benchmark):
+    allowed = _compile_allowed_hosts([], False, None, None, loopback=True)
+    assert allowed is not None
+    with socket.socket() as inst:
+        benchmark(allowed.allows, inst, "127.0.0.2")
+
+
+# ---------------------------------------------------------------------------
+# Port rules
+# ---------------------------------------------------------------------------
+
+_PORT_RULES = [f"10.0.{i // 256}.{i % 256}:{5000 + i}" for i in range(1000)] + [
+    f"172.16.{i}.0/24:{20000 + i * 100}-{20000 + i * 100 + 99}" for i in range(100)
+]
+
+
+def test_bench_port_rule_exact(benchmark):
+    allowed = _compile_allowed_hosts(_PORT_RULES, False, None, None)
+    assert allowed is not None
+    with socket.socket() as inst:
+        benchmark(allowed.allows, inst, "10.0.3.231", 5999)
+
+
+def test_bench_port_rule_range(benchmark):
+    allowed = _compile_allowed_hosts(_PORT_RULES, False, None, None)
+    assert allowed is not None
+    with socket.socket() as inst:
+        benchmark(allowed.allows, inst, "172.16.99.7", 29950)
+
+
+# ---------------------------------------------------------------------------
+# UDP datagrams
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def udp():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(("127.0.0.1", 0))
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            yield sender, receiver.getsockname()
+
+
+def test_bench_sendto_unrestricted(benchmark, udp):
+    sender, address = udp
+    benchmark(sender.sendto, b"metric:1|c", address)
+
+
+def test_bench_sendto_allowed(benchmark, engine, udp):
+    sender, address = udp
+    socket_allow_hosts(["127.0.0.1"])
+    benchmark(sender.sendto, b"metric:1|c", address)
+
+
+# ---------------------------------------------------------------------------
+# Local listener lookup
+# ---------------------------------------------------------------------------
+
+
+def test_bench_local_listener_lookup(benchmark):
+    tracker = _ListenerTracker()
+    servers = [socket.create_server(("127.0.0.1", 0)) for _ in range(50)]
+    try:
+        address = servers[-1].getsockname()
+        benchmark(tracker.allows, address)
+    finally:
+        for server in servers:
+            server.close()
+        tracker.pytest_unconfigure()
+
+
+# ---------------------------------------------------------------------------
+# policy() push/pop
+# ---------------------------------------------------------------------------
+
+
+def test_bench_policy_enter_exit(benchmark):
+    allow = policy(allow_hosts=["127.0.0.1", "10.0.0.0/8"])
+
+    def _enter_exit():
+        with allow:
+            pass
+
+    benchmark(_enter_exit)
+
+
+# ---------------------------------------------------------------------------
+# Enforcement engines: socket creation under each engine
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture(params=["patch", "audit"])
+def engine(request):
+    _set_engine(request.param)
+    yield request.param
+    _remove_restrictions()
+    _set_engine("patch")
+
+
+def _create_socket():
+    socket.socket(socket.AF_INET, socket.SOCK_STREAM).close()
+
+
+def test_bench_engine_create_socket_unrestricted(benchmark, engine):
+    _remove_restrictions()
+    benchmark(_create_socket)
+
+
+def test_bench_engine_create_socket_allow_hosts(benchmark, engine):
+    socket_allow_hosts(["127.0.0.1"])
+    benchmark(_create_socket)
+
+
+def test_bench_engine_create_unix_socket_disabled(benchmark, engine):
+    disable_socket(allow_unix_socket=True)
+    benchmark(lambda: socket.socket(socket.AF_UNIX, socket.SOCK_STREAM).close())
+
+
+def test_bench_engine_isinstance_disabled(benchmark, engine):
+    disable_socket(allow_unix_socket=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        benchmark(isinstance, sock, socket.socket)
+    finally:
+        sock.close()
+
+
+# ---------------------------------------------------------------------------
+# Memory retained by policy setup/teardown cycles
+# ---------------------------------------------------------------------------
+
+_MEMORY_CYCLES = 2000
+_ALLOW_LIST = ["127.0.0.1", "10.0.0.0/8", "localhost", "*.svc.cluster.local"]
+
+
+def _retained_per_cycle(cycle):
+    """Run `cycle` many times and return the bytes and objects it left
+    allocated, per run."""
+    cycle()  # Let caches fill up first.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        bytes_before, _ = tracemalloc.get_traced_memory()
+        objects_before = len(gc.get_objects())
+        for _ in range(_MEMORY_CYCLES):
+            cycle()
+        gc.collect()
+        bytes_after, _ = tracemalloc.get_traced_memory()
+        objects_after = len(gc.get_objects())
+    finally:
+        tracemalloc.stop()
+    return (
+        (bytes_after - bytes_before) / _MEMORY_CYCLES,
+        (objects_after - objects_before) / _MEMORY_CYCLES,
+    )
+
+
+def _disable_cycle():
+    disable_socket(allow_unix_socket=True)
+    _remove_restrictions()
+
+
+_resolution_cache = _ResolutionCache()
+
+
+def _allow_hosts_cycle():
+    socket_allow_hosts(_ALLOW_LIST, resolution_cache=_resolution_cache)
+    _remove_restrictions()
+
+
+def _policy_cycle(allow_policy):
+    with allow_policy:
+        pass
+
+
+@pytest.mark.parametrize(
+    "cycle",
+    [_disable_cycle, _allow_hosts_cycle, _policy_cycle],
+    ids=["disable_socket", "allow_hosts", "policy"],
+)
+def test_bench_policy_cycle_memory(
+    benchmark, record_property, monkeypatch, engine, cycle
+):
+    monkeypatch.setattr(pytest_socket, "resolve_hostnames", lambda _: {"127.0.0.1"})
+    if cycle is _policy_cycle:
+        cycle = functools.partial(cycle, policy(allow_hosts=_ALLOW_LIST))
+    retained_bytes, retained_objects = benchmark.pedantic(
+        _retained_per_cycle, args=(cycle,), rounds=1, iterations=1
+    )
+    record_property("retained_bytes_per_cycle", retained_bytes)
+    record_property("retained_objects_per_cycle", retained_objects)
+    assert retained_bytes < 1
+    assert retained_objects < 0.01
@@ -0,0 +1,147 @@
+"""Tests for failing fast on repeated blocked attempts to the same destination."""
+
+RETRYING_CLIENT_PYFILE = """
+    import socket
+
+    ATTEMPTS = []
+
+    def connect_with_retries(host, retries=10):
+        for _ in range(retries):
+            ATTEMPTS.append(host)
+            try:
+                return socket.create_connection((host, 80))
+            except Exception:
+                continue  # swallow and retry, like a client with backoff
+
+    def test_retry_storm():
+        connect_with_retries("2.2.2.2")
+    """
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-max-blocked-attempts=N",
+            "*Fail a test outright once it made N blocked attempts*",
+        ]
+    )
+
+
+def test_retry_storm_fails_fast(pytester):
+    pytester.makepyfile(RETRYING_CLIENT_PYFILE)
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-max-blocked-attempts=3"
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        '*Failed: A test made 3 blocked attempts to reach "2.2.2.2"; '
+        "failing now instead of waiting for its retries "
+        "(--socket-max-blocked-attempts=3)."
+    )
+
+
+def test_retry_storm_runs_through_without_limit(pytester):
+    pytester.makepyfile(RETRYING_CLIENT_PYFILE + """
+    def test_all_retries_attempted():
+        assert len(ATTEMPTS) == 10
+    """)
+    result = pytester.runpytest("--allow-hosts=127.0.0.1", "-p", "no:randomly")
+    result.assert_outcomes(passed=2)
+
+
+def test_dns_retry_storm_fails_fast(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def test_dns_retries():
+            for _ in range(10):
+                try:
+                    socket.getaddrinfo("db.internal", 5432)
+                except Exception:
+                    pass
+        """)
+    result = pytester.runpytest("--disable-socket", "--socket-max-blocked-attempts=2")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        '*A test made 2 blocked attempts to reach "db.internal"*'
+    )
+
+
+def test_attempts_counted_per_destination_and_test(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest
+
+        def attempt(host):
+            with pytest.raises(Exception):
+                socket.create_connection((host, 80))
+
+        def test_two_destinations():
+            attempt("2.2.2.2")
+            attempt("3.3.3.3")
+            attempt("2.2.2.2")
+            attempt("3.3.3.3")
+
+        def test_counter_reset_between_tests():
+            attempt("2.2.2.2")
+            attempt("2.2.2.2")
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-max-blocked-attempts=3"
+    )
+    result.assert_outcomes(passed=2)
+
+
+def test_attempts_counted_per_thread(pytester):
+    """Tests running concurrently in threads count their own attempts."""
+    pytester.makepyfile("""
+        import socket
+        import threading
+
+        import pytest
+
+        def test_concurrent_attempts():
+            barrier = threading.Barrier(2)
+            outcomes = []
+
+            def attempts():
+                barrier.wait()
+                try:
+                    for _ in range(2):
+                        with pytest.raises(Exception):
+                            socket.create_connection(("2.2.2.2", 80))
+                        barrier.wait()
+                    outcomes.append("passed")
+                except BaseException as exc:
+                    outcomes.append(type(exc).__name__)
+                    barrier.abort()
+
+            threads = [threading.Thread(target=attempts) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert outcomes == ["passed", "passed"]
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-max-blocked-attempts=3"
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_inner_session_leaves_outer_options_alone(pytester, pytestconfig):
+    import pytest_socket
+
+    outer = pytest_socket._session_config()
+    pytester.makepyfile("""
+        def test_nothing():
+            pass
+        """)
+    result = pytester.runpytest("--socket-max-blocked-attempts=3")
+    result.assert_outcomes(passed=1)
+    assert pytest_socket._session_config() is outer
+    assert outer is pytestconfig.stash[pytest_socket._STASH_KEY]
+    assert outer.max_blocked_attempts is None
@@ -0,0 +1,177 @@
+"""Tests for the opt-in tracking of sockets leaked past test teardown."""
+
+import pytest
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-track-leaks={warn,fail}",
+            "*Report sockets a test leaves open past its teardown*",
+        ]
+    )
+
+
+def test_leak_not_tracked_by_default(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        SOCKETS = []
+
+        def test_leak():
+            SOCKETS.append(socket.socket())
+        """)
+    result = pytester.runpytest("-W", "always::UserWarning")
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line("*open past teardown*")
+    result.stdout.no_fnmatch_line("*pytest-socket leak tracking*")
+
+
+def test_leak_warns_with_creation_site(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        SOCKETS = []
+
+        def test_leak():
+            SOCKETS.append(socket.socket())
+        """)
+    result = pytester.runpytest(
+        "-W", "always::UserWarning", "--socket-track-leaks=warn"
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*A test left 1 socket(s) open past teardown:",
+            "*<socket.socket fd=*created at:",
+            "*test_leak_warns_with_creation_site.py*, line 6, in test_leak",
+            "*SOCKETS.append(socket.socket())",
+        ]
+    )
+
+
+def test_leak_fails_teardown(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        SOCKETS = []
+
+        def test_leak():
+            SOCKETS.append(socket.socket())
+
+        def test_no_leak():
+            socket.socket().close()
+        """)
+    result = pytester.runpytest("--socket-track-leaks=fail")
+    result.assert_outcomes(passed=2, errors=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*ERROR at teardown of test_leak*",
+            "*A test left 1 socket(s) open past teardown:",
+        ]
+    )
+
+
+@pytest.mark.parametrize("mode", ["warn", "fail"])
+def test_sockets_closed_by_fixture_teardown_are_not_leaks(pytester, mode):
+    pytester.makepyfile("""
+        import pytest
+        import socket
+
+        @pytest.fixture
+        def sock():
+            s = socket.socket()
+            yield s
+            s.close()
+
+        def test_fixture(sock):
+            with socket.socket():
+                pass
+        """)
+    result = pytester.runpytest(
+        "-W", "error::UserWarning", f"--socket-track-leaks={mode}"
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line("*open past teardown*")
+
+
+@pytest.mark.parametrize("scope", ["session", "module", "class"])
+def test_sockets_of_higher_scoped_fixtures_are_not_leaks(pytester, scope):
+    pytester.makepyfile(f"""
+        import pytest
+        import socket
+
+        @pytest.fixture(scope="{scope}")
+        def sock():
+            s = socket.socket()
+            yield s
+            s.close()
+
+        class TestShared:
+            def test_first(self, sock):
+                pass
+
+            def test_second(self, sock):
+                pass
+        """)
+    result = pytester.runpytest("--socket-track-leaks=fail")
+    result.assert_outcomes(passed=2)
+    result.stdout.no_fnmatch_line("*open past teardown*")
+
+
+def test_many_closed_sockets_are_pruned(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        SOCKETS = []
+
+        def test_many_closed():
+            for _ in range(500):
+                s = socket.socket()
+                s.close()
+                SOCKETS.append(s)
+        """)
+    result = pytester.runpytest("--socket-track-leaks=fail")
+    result.assert_outcomes(passed=1)
+    assert "leaked past teardown: 0" in result.stdout.str()
+    peak = int(result.stdout.str().split("peak open sockets: ")[1].split(",")[0])
+    assert peak < 500
+
+
+def test_session_summary_reports_peak_open_sockets(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        SOCKETS = []
+
+        def test_three_open():
+            socks = [socket.socket() for _ in range(3)]
+            for s in socks:
+                s.close()
+
+        def test_one_leaked():
+            SOCKETS.append(socket.socket())
+        """)
+    result = pytester.runpytest("--socket-track-leaks=warn", "-p", "no:randomly")
+    result.assert_outcomes(passed=2, warnings=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*pytest-socket leak tracking*",
+            "peak open sockets: 3, leaked past teardown: 1",
+        ]
+    )
+
+
+def test_socket_init_restored_after_session(pytester):
+    import socket
+
+    original_init = socket.socket.__init__
+    pytester.makepyfile("""
+        def test_nothing():
+            pass
+        """)
+    result = pytester.runpytest("--socket-track-leaks=warn")
+    result.assert_outcomes(passed=1)
+    assert socket.socket.__init__ is original_init
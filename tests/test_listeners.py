@@ -0,0 +1,105 @@
+"""Tests for allowing connections to servers bound by the test process."""
+
+import socket
+
+import pytest
+
+from .conftest import unix_sockets_only
+
+LISTENER_CODE = """
+    import socket
+
+    import pytest
+
+    from pytest_socket import SocketConnectBlockedError
+
+    def test_own_server():
+        with socket.create_server(("{host}", 0)) as server:
+            port = server.getsockname()[1]
+            socket.create_connection(("{connect_host}", port)).close()
+
+    def test_other_port():
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            port = server.getsockname()[1]
+        with pytest.raises(SocketConnectBlockedError):
+            socket.create_connection(("127.0.0.1", port))
+"""
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--allow-local-listeners*",
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "host,connect_host",
+    [
+        ("127.0.0.1", "127.0.0.1"),
+        ("0.0.0.0", "127.0.0.1"),
+    ],
+)
+def test_connect_to_own_listener_allowed(pytester, host, connect_host):
+    pytester.makepyfile(LISTENER_CODE.format(host=host, connect_host=connect_host))
+    result = pytester.runpytest("--allow-hosts=10.0.0.1", "--allow-local-listeners")
+    result.assert_outcomes(passed=2)
+
+
+def test_listeners_not_allowed_by_default(pytester):
+    pytester.makepyfile(
+        LISTENER_CODE.format(host="127.0.0.1", connect_host="127.0.0.1")
+    )
+    result = pytester.runpytest("--allow-hosts=10.0.0.1")
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines("*SocketConnectBlockedError*")
+
+
+def test_session_listener_allowed_in_every_test(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest
+
+        @pytest.fixture(scope="session")
+        def server():
+            with socket.create_server(("127.0.0.1", 0)) as server:
+                yield server.getsockname()
+
+        @pytest.mark.parametrize("attempt", range(3))
+        def test_connect(server, attempt):
+            socket.create_connection(server).close()
+        """)
+    result = pytester.runpytest("--allow-hosts=10.0.0.1", "--allow-local-listeners")
+    result.assert_outcomes(passed=3)
+
+
+@unix_sockets_only
+def test_connect_to_own_unix_listener_allowed(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def test_unix(tmp_path):
+            path = str(tmp_path / "server.sock")
+            with socket.socket(socket.AF_UNIX) as server:
+                server.bind(path)
+                server.listen()
+                with socket.socket(socket.AF_UNIX) as client:
+                    client.connect(path)
+        """)
+    result = pytester.runpytest("--allow-hosts=10.0.0.1", "--allow-local-listeners")
+    result.assert_outcomes(passed=1)
+
+
+def test_bind_restored_after_session(pytester):
+    original_bind = socket.socket.bind
+    pytester.makepyfile("""
+        def test_nothing():
+            pass
+        """)
+    result = pytester.runpytest("--allow-local-listeners")
+    result.assert_outcomes(passed=1)
+    assert socket.socket.bind is original_bind
@@ -0,0 +1,130 @@
+"""Tests for running the session inside a Linux network namespace."""
+
+import io
+import subprocess
+import sys
+
+import pytest
+
+import pytest_socket
+
+from .common import assert_socket_blocked
+
+
+def _netns_available():
+    if not sys.platform.startswith("linux"):
+        return False
+    probe = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import pytest_socket; "
+            "assert pytest_socket._enter_network_namespace() is None",
+        ],
+        capture_output=True,
+    )
+    return probe.returncode == 0
+
+
+requires_netns = pytest.mark.skipif(
+    not _netns_available(), reason="Unprivileged network namespaces unavailable"
+)
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-netns*Run the session in a Linux network namespace*",
+        ]
+    )
+
+
+@requires_netns
+def test_netns_allows_loopback_only(pytester):
+    # Entering a namespace cannot be undone, so run pytest in a subprocess.
+    pytester.makepyfile("""
+        import socket
+        import subprocess
+        import sys
+
+        import pytest
+
+        def test_loopback_server():
+            with socket.create_server(("127.0.0.1", 0)) as server:
+                with socket.create_connection(server.getsockname()):
+                    pass
+
+        def test_external_unreachable():
+            with pytest.raises(OSError) as exc_info:
+                socket.create_connection(("192.0.2.1", 80), timeout=5)
+            assert "Network is unreachable" in str(exc_info.value)
+
+        def test_subprocess_unreachable():
+            code = "import socket; socket.create_connection(('192.0.2.1', 80), 5)"
+            result = subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True
+            )
+            assert "Network is unreachable" in result.stderr
+        """)
+    result = pytester.runpytest_subprocess("--socket-netns", "--disable-socket")
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines("socket: network namespace with loopback only")
+
+
+def test_netns_unavailable_falls_back_to_disable_socket(pytester, monkeypatch):
+    monkeypatch.setattr(pytest_socket, "_enter_network_namespace", lambda: "not here")
+    pytester.makepyfile("""
+        import socket
+
+        def test_socket():
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        """)
+    result = pytester.runpytest("--socket-netns")
+    assert_socket_blocked(result)
+    result.stdout.fnmatch_lines(
+        "socket: network namespace unavailable (not here), "
+        "falling back to --disable-socket"
+    )
+
+
+@pytest.fixture
+def fake_unshare(monkeypatch):
+    monkeypatch.delenv(pytest_socket._NETNS_ENV_VAR, raising=False)
+    monkeypatch.setattr(pytest_socket, "_unshare", lambda flags: None)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_netns_id_mapping_failure_reported(fake_unshare, monkeypatch):
+    def open_(path, mode="r"):
+        raise PermissionError(1, "Operation not permitted", path)
+
+    monkeypatch.setattr(pytest_socket, "open", open_, raising=False)
+    assert pytest_socket._enter_network_namespace() == (
+        "writing /proc/self/setgroups failed: Operation not permitted"
+    )
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_netns_loopback_failure_reported(fake_unshare, monkeypatch):
+    def ioctl(*args):
+        raise OSError(19, "No such device")
+
+    monkeypatch.setattr(
+        pytest_socket, "open", lambda *args: io.StringIO(), raising=False
+    )
+    monkeypatch.setattr(pytest_socket.fcntl, "ioctl", ioctl)
+    assert pytest_socket._enter_network_namespace() == (
+        "bringing up the loopback interface failed: No such device"
+    )
+
+
+def test_no_netns_header_by_default(pytester):
+    pytester.makepyfile("""
+        def test_nothing():
+            pass
+        """)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line("socket: network namespace*")
@@ -0,0 +1,126 @@
+"""Tests for the `pytest_socket.policy()` context manager and decorator."""
+
+import socket
+import threading
+
+import pytest
+
+import pytest_socket
+from pytest_socket import SocketBlockedError, SocketConnectBlockedError, policy
+
+from .common import assert_socket_blocked
+
+
+def test_policy_context_manager(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+
+        import pytest_socket
+
+        def test_allow_within_block():
+            with pytest_socket.policy(allow_hosts=["{httpserver.host}"]):
+                socket.create_connection(
+                    ("{httpserver.host}", {httpserver.port})
+                ).close()
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        """)
+    result = pytester.runpytest("--disable-socket")
+    assert_socket_blocked(result)
+
+
+def test_policy_decorator(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest_socket
+
+        @pytest_socket.policy(disable_socket=True)
+        def make_socket():
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        def test_decorated():
+            make_socket()
+        """)
+    result = pytester.runpytest()
+    assert_socket_blocked(result)
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+def test_policy_nesting_restores_previous_exactly():
+    outer = policy(allow_hosts=["127.0.0.1"], connect_timeout=3)
+    inner = policy(disable_socket=True)
+    try:
+        with outer:
+            allowed = pytest_socket._active_policy()
+            with inner:
+                with pytest.raises(SocketBlockedError):
+                    socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                with outer:
+                    assert pytest_socket._active_policy() is allowed
+                assert pytest_socket._active_policy().block_sockets
+            assert pytest_socket._active_policy() is allowed
+            with pytest.raises(SocketConnectBlockedError):
+                socket.create_connection(("127.0.0.2", 1))
+        assert pytest_socket._active_policy() == pytest_socket._UNRESTRICTED
+    finally:
+        pytest_socket._remove_restrictions()
+
+
+def test_policy_restored_after_exception():
+    with pytest.raises(ValueError):
+        with policy(disable_socket=True):
+            raise ValueError
+    assert pytest_socket._active_policy() == pytest_socket._UNRESTRICTED
+
+
+def test_policy_resolves_hosts_once(monkeypatch):
+    calls = []
+
+    def resolve(hostname):
+        calls.append(hostname)
+        return {"127.0.0.1"}
+
+    monkeypatch.setattr(pytest_socket, "resolve_hostnames", resolve)
+
+    @policy(allow_hosts=["localhost"])
+    def allowed_hosts():
+        return pytest_socket._active_policy().allowed_hosts.hosts
+
+    try:
+        for _ in range(3):
+            assert allowed_hosts() == {"localhost", "127.0.0.1"}
+    finally:
+        pytest_socket._remove_restrictions()
+    assert calls == ["localhost"]
+
+
+def test_thread_follows_process_policy_after_block():
+    """A thread that had no policy of its own goes back to following the
+    process-wide one once its `with` block ends."""
+    done = threading.Event()
+    disabled = threading.Event()
+    results = []
+
+    def worker():
+        with policy(allow_hosts=["127.0.0.1"]):
+            pass
+        done.set()
+        disabled.wait()
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except SocketBlockedError:
+            results.append("blocked")
+
+    thread = threading.Thread(target=worker)
+    try:
+        with pytest.warns(UserWarning):
+            thread.start()
+            done.wait()
+            pytest_socket.disable_socket()
+            disabled.set()
+            thread.join()
+    finally:
+        pytest_socket._remove_restrictions()
+    assert results == ["blocked"]
@@ -138,3 +138,85 @@ def test_global_disable_and_allow_host(pytester, httpserver):
         """)
     result = pytester.runpytest("--disable-socket", f"--allow-hosts={httpserver.host}")
     assert_socket_blocked(result, passed=1, failed=1)
+
+
+def test_session_fixture_enabled_for_setup(pytester):
+    """A session-scoped fixture requesting `socket_enabled_session` can use
+    the network while being set up, while the tests stay disabled."""
+    pytester.makepyfile("""
+        import socket
+        import pytest
+
+        @pytest.fixture(scope="session")
+        def connection(socket_enabled_session):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            yield sock
+            sock.close()
+
+        def test_first(connection):
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        def test_second(connection):
+            assert connection.fileno() != -1
+        """)
+    result = pytester.runpytest("--disable-socket", "-p", "no:randomly")
+    assert_socket_blocked(result, passed=1, failed=1)
+
+
+def test_module_fixture_allow_hosts_for_setup(pytester, httpserver):
+    """Restrictions a fixture sets up itself are confined to its setup."""
+    pytester.makepyfile(f"""
+        import socket
+        import pytest
+
+        from pytest_socket import SocketConnectBlockedError, socket_allow_hosts
+
+        @pytest.fixture(scope="module")
+        def service(socket_enabled_module):
+            socket_allow_hosts(["{httpserver.host}"])
+            socket.create_connection(("{httpserver.host}", {httpserver.port})).close()
+            with pytest.raises(SocketConnectBlockedError):
+                socket.create_connection(("127.0.0.2", {httpserver.port}))
+
+        def test_service(service):
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        """)
+    result = pytester.runpytest("--disable-socket")
+    assert_socket_blocked(result)
+
+
+def test_class_fixture_disabled_for_setup(pytester):
+    pytester.makepyfile("""
+        import socket
+        import pytest
+
+        @pytest.fixture(scope="class")
+        def offline(socket_disabled_class):
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        class TestOffline:
+            def test_offline(self, offline):
+                pass
+
+        def test_socket():
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM).close()
+        """)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1, errors=1)
+    result.stdout.fnmatch_lines("*SocketBlockedError*")
+
+
+def test_scoped_fixture_scope_mismatch(pytester):
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.fixture(scope="session")
+        def connection(socket_enabled_module):
+            pass
+
+        def test_connection(connection):
+            pass
+        """)
+    result = pytester.runpytest()
+    result.assert_outcomes(errors=1)
+    result.stdout.fnmatch_lines("*ScopeMismatch*")
@@ -1,16 +1,26 @@
 import collections
 import inspect
 import socket
+import sys
+import threading
+import time
 
 import pytest
 
+import pytest_socket
 from pytest_socket import (
     SocketConnectBlockedError,
+    _compile_allowed_hosts,
+    _DomainTrie,
+    _is_loopback,
+    _read_allow_hosts_file,
     _remove_restrictions,
+    _ResolutionCache,
     normalize_allowed_hosts,
     socket_allow_hosts,
 )
 
+from .common import assert_socket_blocked
 from .conftest import unix_sockets_only
 
 localhost = "127.0.0.1"
@@ -112,6 +122,7 @@ def getaddrinfo_hosts(monkeypatch):
         return [v4]
 
     monkeypatch.setattr(socket, "getaddrinfo", _getaddrinfo)
+    monkeypatch.setattr(pytest_socket, "_true_getaddrinfo", _getaddrinfo)
     return hosts
 
 
@@ -157,8 +168,8 @@ def test_single_cli_arg_connect_enabled_localhost_resolved(assert_connect):
     assert_connect(True, cli_arg="localhost")
 
 
-def test_single_cli_arg_127_0_0_1_hostname_localhost_connect_disabled(assert_connect):
-    assert_connect(False, cli_arg=localhost, host="localhost")
+def test_single_cli_arg_127_0_0_1_hostname_localhost_connect_enabled(assert_connect):
+    assert_connect(True, cli_arg=localhost, host="localhost")
 
 
 def test_single_cli_arg_localhost_hostname_localhost_connect_enabled(assert_connect):
@@ -599,3 +610,882 @@ def test_blocked_message_shows_ip_without_redundant_parenthetical(assert_connect
     """
     result = assert_connect(False, cli_arg="1.2.3.4", host="2.2.2.2")
     result.stdout.fnmatch_lines('*allowed: "1.2.3.4"*')
+
+
+FULL_BACKLOG_CONNECT_CODE = """
+    import socket
+
+    import pytest
+
+    @pytest.fixture
+    def full_listener():
+        # With a backlog of zero, Linux drops SYNs once a single connection
+        # is queued, so further connects hang until they time out.
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(0)
+        queued = socket.create_connection(server.getsockname())
+        yield server.getsockname()
+        queued.close()
+        server.close()
+
+    {0}
+    def test_connect(full_listener):
+        sock = socket.socket()
+        sock.connect(full_listener)
+"""
+
+
+def test_connect_timeout_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-connect-timeout=SECONDS",
+            "*Cap the time a connect to an allowed host may block.",
+        ]
+    )
+
+
+@pytest.mark.skipif(
+    sys.platform != "linux", reason="Relies on Linux dropping SYNs on a full backlog"
+)
+def test_connect_timeout_caps_hanging_allowed_connect(pytester):
+    pytester.makepyfile(FULL_BACKLOG_CONNECT_CODE.format(""))
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-connect-timeout=0.2"
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        '*SocketConnectTimeoutError: Connecting to allowed host "127.0.0.1" '
+        "timed out after 0.2s*"
+    )
+
+
+@pytest.mark.skipif(
+    sys.platform != "linux", reason="Relies on Linux dropping SYNs on a full backlog"
+)
+def test_connect_timeout_marker_overrides_cli(pytester):
+    pytester.makepyfile(
+        FULL_BACKLOG_CONNECT_CODE.format(
+            "@pytest.mark.allow_hosts(connect_timeout=0.1)"
+        )
+    )
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-connect-timeout=600"
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines("*timed out after 0.1s*")
+
+
+@pytest.mark.parametrize("user_timeout", [None, 0.05, 30.0])
+def test_connect_timeout_restores_user_timeout(httpserver, user_timeout):
+    socket_allow_hosts([httpserver.host], connect_timeout=1.0)
+    try:
+        with socket.socket() as sock:
+            sock.settimeout(user_timeout)
+            sock.connect((httpserver.host, httpserver.port))
+            assert sock.gettimeout() == user_timeout
+    finally:
+        _remove_restrictions()
+
+
+def test_socket_allow_fixture_adds_dynamic_server(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest
+
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_add(socket_allow):
+            with socket.create_server(("127.0.0.1", 0)) as server:
+                with pytest.raises(SocketConnectBlockedError):
+                    socket.create_connection(server.getsockname())
+                socket_allow.add("127.0.0.1")
+                socket.create_connection(server.getsockname()).close()
+
+        def test_add_network(socket_allow):
+            with socket.create_server(("127.0.0.1", 0)) as server:
+                socket_allow.add("127.0.0.0/8")
+                socket.create_connection(server.getsockname()).close()
+                socket_allow.remove("127.0.0.0/8")
+                with pytest.raises(SocketConnectBlockedError):
+                    socket.create_connection(server.getsockname())
+        """)
+    result = pytester.runpytest("--allow-hosts=10.0.0.1")
+    result.assert_outcomes(passed=2)
+
+
+def test_socket_allow_fixture_lifts_disable_socket(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest
+
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_add(socket_allow):
+            socket_allow.add("127.0.0.1")
+            with socket.create_server(("127.0.0.1", 0)) as server:
+                socket.create_connection(server.getsockname()).close()
+            with pytest.raises(SocketConnectBlockedError):
+                socket.create_connection(("127.0.0.2", 80))
+
+        def test_after(socket_allow):
+            socket.socket()
+        """)
+    result = pytester.runpytest("--disable-socket", "-p", "no:randomly")
+    assert_socket_blocked(result, passed=1)
+
+
+def test_socket_allow_resolves_only_new_entry(pytester):
+    pytester.makepyfile("""
+        import pytest_socket
+
+        def test_add(socket_allow, monkeypatch):
+            resolved = []
+
+            def resolve(hostname):
+                resolved.append(hostname)
+                return {"127.0.0.5"}
+
+            monkeypatch.setattr(pytest_socket, "resolve_hostnames", resolve)
+            socket_allow.add("db.test")
+            socket_allow.remove("10.0.0.1")
+            assert resolved == ["db.test"]
+            allowed = pytest_socket._active_policy().allowed_hosts
+            assert allowed.hosts == {"localhost", "127.0.0.1", "db.test", "127.0.0.5"}
+            assert allowed.allowed_list == [
+                "db.test (127.0.0.5)",
+                "localhost (127.0.0.1)",
+            ]
+        """)
+    # Resolved before the test starts, so the fake resolver is not asked.
+    result = pytester.runpytest("--allow-hosts=localhost,10.0.0.1")
+    result.assert_outcomes(passed=1)
+
+
+def test_socket_allow_remove_unknown_entry(pytester):
+    pytester.makepyfile("""
+        import pytest
+
+        def test_remove(socket_allow):
+            with pytest.raises(ValueError, match="not in the allow-list"):
+                socket_allow.remove("10.0.0.2")
+        """)
+    result = pytester.runpytest("--allow-hosts=10.0.0.1")
+    result.assert_outcomes(passed=1)
+
+
+def test_read_allow_hosts_file_collapses_networks(tmp_path):
+    path = tmp_path / "hosts.txt"
+    path.write_text(
+        "# infra inventory\n"
+        "10.0.0.0/25\n"
+        "10.0.0.128/25  # adjacent to the previous range\n"
+        "10.0.0.7\n"
+        "192.168.1.1, 192.168.1.1\n"
+        "\n"
+        "db.internal\n"
+        "::1\n"
+        "2001:db8::/33,2001:db8:8000::/33\n"
+    )
+    assert _read_allow_hosts_file(str(path)) == [
+        "db.internal",
+        "10.0.0.0/24",
+        "192.168.1.1",
+        "::1",
+        "2001:db8::/32",
+    ]
+
+
+def test_allow_hosts_file(pytester, httpserver):
+    hosts_file = pytester.path / "hosts.txt"
+    hosts_file.write_text(f"{httpserver.host}\n10.0.0.0/8\n")
+    pytester.makepyfile(f"""
+        import socket
+
+        def test_allowed():
+            socket.create_connection(("{httpserver.host}", {httpserver.port})).close()
+
+        def test_blocked():
+            socket.create_connection(("172.16.0.1", 80))
+        """)
+    result = pytester.runpytest(
+        f"--allow-hosts-file={hosts_file}", "--allow-hosts=192.168.0.1"
+    )
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines('*allowed: "10.0.0.0/8,127.0.0.1,192.168.0.1"*')
+
+
+def test_allow_hosts_file_error_summarizes_allowed_hosts(pytester):
+    hosts_file = pytester.path / "hosts.txt"
+    hosts_file.write_text("\n".join(f"10.{i}.{i}.1" for i in range(25)))
+    pytester.makepyfile("""
+        import socket
+
+        def test_blocked():
+            socket.create_connection(("172.16.0.1", 80))
+        """)
+    result = pytester.runpytest(f"--allow-hosts-file={hosts_file}")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines('*allowed: "10.0.0.1,*,... and 15 more")*')
+
+
+def test_allow_hosts_file_missing(pytester):
+    result = pytester.runpytest("--allow-hosts-file=missing.txt")
+    result.stderr.fnmatch_lines(
+        "*Could not read --allow-hosts-file: No such file or directory (missing.txt)"
+    )
+
+
+def test_allow_hosts_compiled_once_per_session(pytester):
+    pytester.makepyfile("""
+        import pytest
+
+        import pytest_socket
+
+        COMPILED = []
+
+        @pytest.mark.parametrize("attempt", range(3))
+        def test_compiled(attempt):
+            COMPILED.append(pytest_socket._active_policy().allowed_hosts)
+            assert all(c is COMPILED[0] for c in COMPILED)
+        """)
+    result = pytester.runpytest("--allow-hosts=10.0.0.0/8,127.0.0.1")
+    result.assert_outcomes(passed=3)
+
+
+@pytest.mark.parametrize(
+    "hostname,expected",
+    [
+        ("api.svc.cluster.local", True),
+        ("v1.api.svc.cluster.local", True),
+        ("API.SVC.Cluster.Local.", True),
+        ("svc.cluster.local", False),
+        ("apisvc.cluster.local", False),
+        ("svc.cluster.local.evil.com", False),
+        ("db.example.com", True),
+        ("example.com", False),
+    ],
+)
+def test_domain_patterns_match_subdomains(hostname, expected):
+    trie = _DomainTrie(["*.svc.cluster.local", ".example.com"])
+    assert trie.matches(hostname) is expected
+
+
+def test_domain_patterns_not_resolved_up_front(monkeypatch):
+    def resolve(hostname):
+        raise AssertionError(f"{hostname} resolved")
+
+    monkeypatch.setattr(pytest_socket, "resolve_hostnames", resolve)
+    allowed = _compile_allowed_hosts(["*.svc.cluster.local"], False, None, None)
+    assert allowed.patterns == ("*.svc.cluster.local",)
+    assert allowed.allowed_list == ["*.svc.cluster.local"]
+
+
+def test_domain_pattern_allows_resolved_addresses(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+
+        import pytest_socket
+        from pytest_socket import SocketConnectBlockedError
+
+        @pytest.fixture
+        def fake_dns(monkeypatch):
+            true_getaddrinfo = pytest_socket._true_getaddrinfo
+
+            def getaddrinfo(host, port, *args, **kwargs):
+                if host.startswith("api."):
+                    host = "127.0.0.1"
+                return true_getaddrinfo(host, port, *args, **kwargs)
+
+            monkeypatch.setattr(pytest_socket, "_true_getaddrinfo", getaddrinfo)
+
+        def test_by_resolved_address(fake_dns):
+            with pytest.raises(SocketConnectBlockedError):
+                socket.create_connection(("127.0.0.1", {httpserver.port}))
+            socket.create_connection(
+                ("api.svc.cluster.local", {httpserver.port})
+            ).close()
+            socket.create_connection(("127.0.0.1", {httpserver.port})).close()
+
+        def test_addresses_forgotten_after_test():
+            with pytest.raises(SocketConnectBlockedError):
+                socket.create_connection(("127.0.0.1", {httpserver.port}))
+
+        def test_other_domain_blocked(fake_dns):
+            with pytest.raises(SocketConnectBlockedError):
+                socket.create_connection(("api.svc.other.local", {httpserver.port}))
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=*.svc.cluster.local", "-p", "no:randomly"
+    )
+    result.assert_outcomes(passed=3)
+
+
+def test_domain_pattern_addresses_stay_in_their_context(monkeypatch):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))]
+
+    # Restored last, after `_remove_restrictions()` put the fake in place.
+    monkeypatch.setattr(socket, "getaddrinfo", socket.getaddrinfo)
+    monkeypatch.setattr(pytest_socket, "_true_getaddrinfo", getaddrinfo)
+    allowed_in_thread = []
+
+    def resolve_in_thread():
+        with pytest_socket.policy(allow_hosts=["*.svc.cluster.local"]):
+            socket.getaddrinfo("api.svc.cluster.local", 80)
+            inst = socket.socket()
+            try:
+                allowed_in_thread.append(
+                    pytest_socket._active_policy().allowed_hosts.allows(
+                        inst, "127.0.0.1"
+                    )
+                )
+            finally:
+                inst.close()
+
+    allowed = _compile_allowed_hosts(["*.svc.cluster.local"], False, None, None)
+    thread = threading.Thread(target=resolve_in_thread)
+    thread.start()
+    thread.join()
+    _remove_restrictions()
+    inst = socket.socket()
+    try:
+        assert allowed_in_thread == [True]
+        assert not allowed.allows(inst, "127.0.0.1")
+    finally:
+        inst.close()
+
+
+@pytest.fixture
+def resolved(monkeypatch):
+    calls = []
+
+    def resolve(hostname):
+        calls.append(hostname)
+        return {"127.0.0.1"} if hostname == "localhost" else set()
+
+    monkeypatch.setattr(pytest_socket, "resolve_hostnames", resolve)
+    return calls
+
+
+def test_resolution_cache_remembers_failures(resolved):
+    cache = _ResolutionCache(ttl=60)
+    for _ in range(3):
+        assert cache.resolve("localhost") == {"127.0.0.1"}
+        assert cache.resolve("dead.invalid") == set()
+    assert resolved == ["localhost", "dead.invalid"]
+
+
+def test_resolution_cache_expires_entries(resolved):
+    cache = _ResolutionCache(ttl=0)
+    cache.resolve("localhost")
+    cache.resolve("localhost")
+    assert resolved == ["localhost", "localhost"]
+
+
+def test_resolution_cache_is_bounded(resolved):
+    cache = _ResolutionCache(ttl=60, maxsize=2)
+    for name in ("a.invalid", "b.invalid", "c.invalid", "a.invalid"):
+        cache.resolve(name)
+    assert resolved == ["a.invalid", "b.invalid", "c.invalid", "a.invalid"]
+
+
+def test_lazy_resolution_only_when_needed(pytester, httpserver):
+    pytester.makeconftest("""
+        import pytest_socket
+
+        RESOLVED = []
+        true_resolve = pytest_socket.resolve_hostnames
+
+        def resolve(hostname):
+            RESOLVED.append(hostname)
+            return true_resolve(hostname)
+
+        def pytest_configure():
+            pytest_socket.resolve_hostnames = resolve
+
+        def pytest_unconfigure():
+            pytest_socket.resolve_hostnames = true_resolve
+        """)
+    pytester.makepyfile(f"""
+        import socket
+
+        from conftest import RESOLVED
+
+        def test_no_connect():
+            assert RESOLVED == []
+
+        def test_connect_by_address():
+            socket.create_connection(("{httpserver.host}", {httpserver.port})).close()
+            assert RESOLVED == ["localhost"]
+
+        def test_connect_again():
+            socket.create_connection(("{httpserver.host}", {httpserver.port})).close()
+            assert RESOLVED == ["localhost"]
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=localhost", "--socket-lazy-resolution", "-p", "no:randomly"
+    )
+    result.assert_outcomes(passed=3)
+
+
+def test_lazy_resolution_error_lists_host_names(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def test_blocked():
+            socket.create_connection(("172.16.0.1", 80))
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=localhost,10.0.0.1", "--socket-lazy-resolution"
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines('*(allowed: "10.0.0.1,localhost")*')
+
+
+def test_resolution_cache_evicts_least_recently_used(resolved):
+    cache = _ResolutionCache(maxsize=2)
+    for name in ("a.invalid", "b.invalid", "a.invalid", "c.invalid", "a.invalid"):
+        cache.resolve(name)
+    assert resolved == ["a.invalid", "b.invalid", "c.invalid"]
+    assert (cache.hits, cache.misses, cache.evictions, len(cache)) == (2, 3, 1, 2)
+
+
+def test_resolution_cache_summary(pytester):
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.allow_hosts(["localhost"])
+        def test_one():
+            pass
+
+        @pytest.mark.allow_hosts(["localhost", "127.0.0.2"])
+        def test_two():
+            pass
+        """)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(
+        [
+            "*pytest-socket host name resolution*",
+            "allow-list: 1 hits, 1 misses, 0 evictions, "
+            "1 of at most 4096 host names cached",
+        ]
+    )
+
+
+def test_resolution_cache_summary_without_host_names(pytester):
+    pytester.makepyfile("""
+        def test_one():
+            pass
+        """)
+    result = pytester.runpytest("--allow-hosts=127.0.0.1")
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line("*pytest-socket host name resolution*")
+
+
+def test_connect_by_host_name_resolved_once(pytester, httpserver):
+    pytester.makeconftest("""
+        import pytest_socket
+
+        RESOLVED = []
+        true_resolve = pytest_socket.resolve_hostnames
+
+        def resolve(hostname):
+            RESOLVED.append(hostname)
+            return {"127.0.0.1"} if hostname == "localhost" else set()
+
+        def pytest_configure():
+            pytest_socket.resolve_hostnames = resolve
+
+        def pytest_unconfigure():
+            pytest_socket.resolve_hostnames = true_resolve
+        """)
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+        from pytest_socket import SocketConnectBlockedError
+
+        from conftest import RESOLVED
+
+        def connect(host):
+            s = socket.socket()
+            try:
+                s.connect((host, {httpserver.port}))
+            except ConnectionRefusedError:
+                pass
+            finally:
+                s.close()
+
+        def test_connect_by_name():
+            for _ in range(3):
+                connect("localhost")
+            assert RESOLVED == ["localhost"]
+
+        def test_name_outside_allow_list():
+            with pytest.raises(SocketConnectBlockedError):
+                connect("remote.invalid")
+        """)
+    result = pytester.runpytest("--allow-hosts=127.0.0.1", "-p", "no:randomly")
+    result.assert_outcomes(passed=2)
+
+
+def test_connect_by_host_name_within_network(resolved):
+    allowed = _compile_allowed_hosts(["127.0.0.0/8"], False, _ResolutionCache(), None)
+    assert allowed is not None
+    inst = socket.socket()
+    try:
+        assert allowed.allows(inst, "localhost")
+        assert allowed.allows(inst, "localhost")
+        assert not allowed.allows(inst, "remote.invalid")
+    finally:
+        inst.close()
+    assert resolved == ["localhost", "remote.invalid"]
+    assert {host: verdict for host, (_, verdict) in allowed.verdicts.items()} == {
+        "localhost": True,
+        "remote.invalid": False,
+    }
+
+
+def test_host_name_verdicts_expire_with_resolution(monkeypatch):
+    answers = {"alias.test": set()}
+    monkeypatch.setattr(pytest_socket, "resolve_hostnames", answers.get)
+    allowed = _compile_allowed_hosts(
+        ["10.0.0.1"], False, _ResolutionCache(ttl=0.05), None, lazy=True
+    )
+    assert allowed is not None
+    inst = socket.socket()
+    try:
+        assert not allowed.allows(inst, "alias.test")
+        answers["alias.test"] = {"10.0.0.1"}
+        assert not allowed.allows(inst, "alias.test")
+        time.sleep(0.06)
+        assert allowed.allows(inst, "alias.test")
+    finally:
+        inst.close()
+
+
+def test_host_name_verdicts_memoized_with_lazy_resolution(resolved):
+    resolver = _ResolutionCache(ttl=60)
+    allowed = _compile_allowed_hosts(
+        ["127.0.0.1", "other.invalid"], False, resolver, None, lazy=True
+    )
+    assert allowed is not None
+    inst = socket.socket()
+    try:
+        for _ in range(5):
+            assert allowed.allows(inst, "localhost")
+    finally:
+        inst.close()
+    assert resolved == ["localhost"]
+    assert (resolver.hits, resolver.misses) == (0, 1)
+
+
+def test_host_name_verdicts_are_bounded(resolved):
+    allowed = _compile_allowed_hosts(
+        ["127.0.0.0/8"], False, _ResolutionCache(maxsize=2), None
+    )
+    assert allowed is not None
+    inst = socket.socket()
+    try:
+        for name in ("a.invalid", "b.invalid", "c.invalid"):
+            assert not allowed.allows(inst, name)
+    finally:
+        inst.close()
+    assert list(allowed.verdicts) == ["b.invalid", "c.invalid"]
+
+
+@pytest.fixture
+def dual_stack(monkeypatch):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::1", port, 0, 0)),
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("::1", port, 0, 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port)),
+        ]
+
+    # Restored last, after `_remove_restrictions()` put the fake in place.
+    monkeypatch.setattr(socket, "getaddrinfo", socket.getaddrinfo)
+    monkeypatch.setattr(pytest_socket, "_true_getaddrinfo", getaddrinfo)
+    yield
+    _remove_restrictions()
+
+
+@pytest.mark.parametrize(
+    "family, expected",
+    [
+        ("any", ["::1", "127.0.0.1"]),
+        ("ipv4", ["127.0.0.1", "::1"]),
+        ("ipv6", ["::1", "127.0.0.1"]),
+    ],
+)
+def test_filter_resolved_keeps_allowed_addresses(
+    monkeypatch, pytestconfig, dual_stack, family, expected
+):
+    socket_config = pytestconfig.stash[pytest_socket._STASH_KEY]
+    monkeypatch.setattr(socket_config, "filter_resolved", family)
+    socket_allow_hosts(["127.0.0.1", "::1"])
+    result = socket.getaddrinfo("dual.test", 80)
+    assert [info[4][0] for info in result] == expected
+
+
+def test_filter_resolved_keeps_all_when_none_allowed(
+    monkeypatch, pytestconfig, dual_stack
+):
+    socket_config = pytestconfig.stash[pytest_socket._STASH_KEY]
+    monkeypatch.setattr(socket_config, "filter_resolved", "any")
+    socket_allow_hosts(["10.0.0.1"])
+    assert len(socket.getaddrinfo("dual.test", 80)) == 3
+
+
+def test_filter_resolved_off_by_default(dual_stack):
+    socket_allow_hosts(["127.0.0.1"])
+    assert socket.getaddrinfo is not pytest_socket._guarded_getaddrinfo
+
+
+def test_filter_resolved_cli(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def test_localhost():
+            result = socket.getaddrinfo("localhost", 80, type=socket.SOCK_STREAM)
+            assert [info[4][0] for info in result] == ["127.0.0.1"]
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-filter-resolved=ipv4"
+    )
+    result.assert_outcomes(passed=1)
+
+
+@pytest.mark.parametrize(
+    "host", ["localhost", "10.0.0.1"], ids=["allowed", "not-allowed"]
+)
+def test_filter_resolved_with_lazy_resolution(pytester, host):
+    pytester.makepyfile(f"""
+        import socket
+
+        def test_resolve():
+            result = socket.getaddrinfo("{host}", 80, type=socket.SOCK_STREAM)
+            assert result
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=localhost",
+        "--socket-lazy-resolution",
+        "--socket-filter-resolved=any",
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_filter_resolved_leaves_paths_alone(pytester):
+    pytester.makepyfile("""
+        def test_nothing():
+            pass
+        """)
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", "--socket-filter-resolved", "any", str(pytester.path)
+    )
+    result.assert_outcomes(passed=1)
+
+
+@pytest.mark.parametrize(
+    "host, expected",
+    [
+        ("127.0.0.1", True),
+        ("127.0.0.2", True),
+        ("127.255.255.254", True),
+        ("::1", True),
+        ("::ffff:127.0.0.1", True),
+        ("localhost", True),
+        ("128.0.0.1", False),
+        ("10.127.0.1", False),
+        ("::ffff:10.0.0.1", False),
+        ("127.example.com", False),
+        ("127.0.0.1.example.com", False),
+        ("::2", False),
+    ],
+)
+def test_is_loopback(host, expected):
+    assert _is_loopback(host) is expected
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--disable-socket"]])
+def test_allow_loopback(pytester, httpserver, extra_args):
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_loopback():
+            socket.create_connection(("127.0.0.1", {httpserver.port})).close()
+
+        def test_remote():
+            with pytest.raises(SocketConnectBlockedError, match='allowed: "loopback"'):
+                socket.socket().connect(("10.0.0.1", 80))
+        """)
+    result = pytester.runpytest("--allow-loopback", *extra_args)
+    result.assert_outcomes(passed=2)
+
+
+def test_allow_loopback_with_allow_hosts(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_remote():
+            with pytest.raises(
+                SocketConnectBlockedError, match='allowed: "10.0.0.2,loopback"'
+            ):
+                socket.socket().connect(("10.0.0.1", 80))
+        """)
+    result = pytester.runpytest("--allow-loopback", "--allow-hosts=10.0.0.2")
+    result.assert_outcomes(passed=1)
+
+
+@pytest.mark.parametrize(
+    "host, port, expected",
+    [
+        ("127.0.0.1", 5432, True),
+        ("127.0.0.1", 5433, False),
+        ("::1", 8000, True),
+        ("::1", 8099, True),
+        ("::1", 8100, False),
+        ("10.1.2.3", 443, True),
+        ("10.1.2.3", 80, False),
+        ("192.168.0.1", 1024, True),
+        ("192.168.0.1", 65535, True),
+        ("192.168.0.1", 1023, False),
+        ("127.0.0.1", None, False),
+    ],
+)
+def test_port_rules(host, port, expected):
+    allowed = _compile_allowed_hosts(
+        "127.0.0.1:5432,[::1]:8000-8099,10.0.0.0/8:443,192.168.0.1:1024-65535",
+        False,
+        None,
+        None,
+    )
+    assert allowed is not None
+    with socket.socket() as inst:
+        assert allowed.allows(inst, host, port) is expected
+
+
+@pytest.mark.parametrize("entry", ["127.0.0.1:http", "127.0.0.1:90-80", "::1:80"])
+def test_port_rule_unparsable_is_plain_host(entry):
+    allowed = _compile_allowed_hosts([entry], False, None, None)
+    assert allowed is not None
+    assert allowed.ports == ()
+    with socket.socket() as inst:
+        assert not allowed.allows(inst, "127.0.0.1", 80)
+
+
+def test_port_rule_by_host_name(resolved):
+    allowed = _compile_allowed_hosts(
+        ["localhost:5432"], False, _ResolutionCache(), None
+    )
+    assert allowed is not None
+    with socket.socket() as inst:
+        assert allowed.allows(inst, "localhost", 5432)
+        assert allowed.allows(inst, "127.0.0.1", 5432)
+        assert not allowed.allows(inst, "127.0.0.1", 5433)
+
+
+def test_port_rules_cli(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_allowed_port():
+            socket.create_connection(("127.0.0.1", {httpserver.port})).close()
+
+        def test_other_port():
+            with pytest.raises(SocketConnectBlockedError):
+                socket.socket().connect(("127.0.0.1", {httpserver.port + 1}))
+        """)
+    result = pytester.runpytest(f"--allow-hosts=127.0.0.1:{httpserver.port}")
+    result.assert_outcomes(passed=2)
+
+
+def test_socket_allow_port_rule(pytester, httpserver):
+    pytester.makepyfile(f"""
+        import socket
+
+        import pytest
+        from pytest_socket import SocketConnectBlockedError
+
+        def test_add_remove(socket_allow):
+            socket_allow.add("127.0.0.1:{httpserver.port}")
+            socket.create_connection(("127.0.0.1", {httpserver.port})).close()
+            socket_allow.remove("127.0.0.1:{httpserver.port}")
+            with pytest.raises(SocketConnectBlockedError):
+                socket.socket().connect(("127.0.0.1", {httpserver.port}))
+        """)
+    result = pytester.runpytest("--allow-hosts=10.0.0.1")
+    result.assert_outcomes(passed=1)
+
+
+PYFILE_DESTINATION_METHODS = """
+    import socket
+
+    import pytest
+    from pytest_socket import SocketConnectBlockedError
+
+    @pytest.fixture
+    def udp():
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+            receiver.bind(("127.0.0.1", 0))
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+                yield sender, receiver.getsockname()
+
+    def test_sendto_allowed(udp):
+        sender, address = udp
+        sender.sendto(b"x", address)
+        sender.sendto(b"x", 0, address)
+
+    def test_sendto_blocked(udp):
+        sender, _ = udp
+        with pytest.raises(SocketConnectBlockedError, match=r"sendto\\(\\)"):
+            sender.sendto(b"x", ("10.0.0.1", 8125))
+        # The socket stays usable for allowed destinations.
+        sender.sendto(b"x", ("127.0.0.1", 9))
+
+    def test_sendmsg(udp):
+        sender, address = udp
+        sender.sendmsg([b"x"], [], 0, address)
+        with pytest.raises(SocketConnectBlockedError, match=r"sendmsg\\(\\)"):
+            sender.sendmsg([b"x"], [], 0, ("10.0.0.1", 8125))
+
+    def test_connect_ex_blocked():
+        with socket.socket() as sock:
+            with pytest.raises(SocketConnectBlockedError):
+                sock.connect_ex(("10.0.0.1", 80))
+"""
+
+
+@unix_sockets_only
+@pytest.mark.parametrize("engine", ["patch", "audit"])
+def test_destination_methods_guarded(pytester, engine):
+    pytester.makepyfile(PYFILE_DESTINATION_METHODS)
+    result = pytester.runpytest(
+        "--allow-hosts=127.0.0.1", f"--socket-engine={engine}", "-p", "no:randomly"
+    )
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        [
+            "*pytest-socket destination checks*",
+            "connect*(): 0 allowed, 1 blocked",
+            "sendmsg(): 1 allowed, 1 blocked",
+            "sendto(): 3 allowed, 1 blocked",
+        ]
+    )
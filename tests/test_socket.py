@@ -5,6 +5,8 @@ import pytest
 from pytest_socket import (
     SocketBlockedError,
     SocketConnectBlockedError,
+    SocketConnectTimeoutError,
+    _UnixSocketPaths,
     disable_socket,
     enable_socket,
     host_from_address,
@@ -301,6 +303,8 @@ def test_blocked_connect_emits_warning(pytester, httpserver):
     [
         SocketBlockedError(),
         SocketConnectBlockedError(["0.0.0.0", "127.0.0.1"], "192.0.80.239"),
+        SocketConnectBlockedError(["127.0.0.1"], "192.0.80.239", method="sendto"),
+        SocketConnectTimeoutError("192.0.80.239", 2.5),
     ],
 )
 def test_exceptions_are_pickleable(exc):
@@ -405,3 +409,164 @@ def test_socket_disabled_fixture_blocks_during_setup(pytester):
     result = pytester.runpytest()
     result.assert_outcomes(errors=1)
     result.stdout.fnmatch_lines("*SocketBlockedError*")
+
+
+def test_repeated_blocked_calls_warn_once(pytester):
+    """Polling or retrying code warns once per call site and destination,
+    with the repeats counted in the terminal summary."""
+    pytester.makepyfile("""
+        import socket
+
+        def test_polling():
+            for _ in range(100):
+                try:
+                    socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                except Exception:
+                    pass
+        """)
+    result = pytester.runpytest("-W", "always::UserWarning", "--disable-socket")
+    result.assert_outcomes(passed=1, warnings=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*test_repeated_blocked_calls_warn_once.py:6: UserWarning: "
+            "A test tried to use socket.socket.",
+            "*pytest-socket repeated blocked calls*",
+            "test_repeated_blocked_calls_warn_once.py::test_polling "
+            '*test_repeated_blocked_calls_warn_once.py:6 "A test tried to use '
+            'socket.socket.": 100 calls, warned once',
+        ]
+    )
+
+
+def test_blocked_call_warnings_are_per_test_and_destination(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        def connect(host):
+            for _ in range(5):
+                try:
+                    socket.socket().connect((host, 80))
+                except Exception:
+                    pass
+
+        def test_first():
+            connect("2.2.2.2")
+            connect("3.3.3.3")
+
+        def test_second():
+            connect("2.2.2.2")
+        """)
+    result = pytester.runpytest("-W", "always::UserWarning", "--allow-hosts=1.2.3.4")
+    result.assert_outcomes(passed=2, warnings=3)
+
+
+def test_only_repeated_blocked_calls_kept_past_teardown(pytester):
+    pytester.makepyfile("""
+        import socket
+
+        import pytest
+        import pytest_socket
+
+        def block(times):
+            for _ in range(times):
+                try:
+                    socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                except Exception:
+                    pass
+
+        @pytest.mark.parametrize("i", range(50))
+        def test_once(i):
+            block(1)
+
+        def test_repeated():
+            block(3)
+
+        def test_kept(pytestconfig):
+            socket_config = pytestconfig.stash[pytest_socket._STASH_KEY]
+            assert not pytest_socket._blocked_warnings
+            assert list(socket_config.repeated_blocked_calls.values()) == [3]
+        """)
+    result = pytester.runpytest("--disable-socket", "-p", "no:randomly")
+    result.assert_outcomes(passed=52, warnings=51)
+
+
+def test_blocked_connect_renders_allow_list_lazily():
+    allowed = ["127.0.0.1", "10.0.0.0/8"]
+    with pytest.warns(UserWarning):
+        errors = [SocketConnectBlockedError(allowed, "2.2.2.2") for _ in range(50)]
+    # Only the first, warned, error rendered its message.
+    assert errors[0]._message is not None
+    assert all(error._message is None for error in errors[1:])
+    assert str(errors[-1]) == (
+        "A test tried to use socket.socket.connect() with host "
+        '"2.2.2.2" (allowed: "127.0.0.1,10.0.0.0/8").'
+    )
+    assert errors[-1].args == (str(errors[-1]),)
+
+
+@unix_sockets_only
+@pytest.mark.parametrize(
+    "entry, path, expected",
+    [
+        ("/run/app.sock", "/run/app.sock", True),
+        ("/run/app.sock", "/run/app.sock2", False),
+        ("/run/app/", "/run/app/x.sock", True),
+        ("/run/app/", "/run/app/../docker.sock", False),
+        ("/run/app/", "/run/appx.sock", False),
+        ("/tmp/pytest-*", "/tmp/pytest-of-root/s.sock", True),
+        ("@app", "\0app", True),
+        ("@app", b"\0app", True),
+        ("@app*", "\0app-1", True),
+        ("@app", "\0application", False),
+        ("@app", "/app", False),
+    ],
+)
+def test_unix_socket_paths_matcher(entry, path, expected):
+    assert _UnixSocketPaths([entry]).allows(path) is expected
+
+
+PYFILE_UNIX_SOCKET_PATHS = """
+    import socket
+
+    import pytest
+    from pytest_socket import SocketConnectBlockedError
+
+    @pytest.fixture
+    def server(tmp_path):
+        path = str(tmp_path / "allowed.sock")
+        with socket.socket(socket.AF_UNIX) as server:
+            server.bind(path)
+            server.listen()
+            yield path
+
+    def test_allowed_path(server):
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(server)
+
+    def test_other_path(tmp_path):
+        with socket.socket(socket.AF_UNIX) as client:
+            with pytest.raises(SocketConnectBlockedError):
+                client.connect("/var/run/docker.sock")
+
+    def test_socketpair():
+        a, b = socket.socketpair()
+        a.close()
+        b.close()
+"""
+
+
+@unix_sockets_only
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--disable-socket"],
+        ["--disable-socket", "--socket-engine=audit"],
+        ["--allow-hosts=127.0.0.1"],
+    ],
+)
+def test_allow_unix_socket_paths(pytester, args):
+    pytester.makepyfile(PYFILE_UNIX_SOCKET_PATHS)
+    result = pytester.runpytest(
+        f"--allow-unix-socket-paths={pytester.path.parent}/", *args
+    )
+    result.assert_outcomes(passed=3)
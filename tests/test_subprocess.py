@@ -0,0 +1,222 @@
+"""Tests for propagating the socket policy into child interpreters."""
+
+import os
+import site
+
+import pytest
+
+from pytest_socket import (
+    _AllowedHosts,
+    _compile_allowed_hosts,
+    _dump_policy,
+    _export_policy,
+    _load_policy,
+    _Policy,
+    _UnixSocketPaths,
+)
+
+from .conftest import unix_sockets_only
+
+requires_startup_hook = pytest.mark.skipif(
+    not any(
+        os.path.exists(os.path.join(path, "pytest_socket_policy.pth"))
+        for path in site.getsitepackages()
+    ),
+    reason="pytest_socket_policy.pth is not installed in site-packages",
+)
+
+CHILD_CODE = """
+    import subprocess
+    import sys
+
+    def run_child(code):
+        return subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+"""
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-propagate*Apply the restrictions to Python subprocesses*",
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "policy",
+    [
+        _Policy(block_sockets=True, allow_unix_socket=True),
+        _Policy(
+            allowed_hosts=_AllowedHosts(
+                hosts=frozenset({"127.0.0.1", "localhost", "::1"}),
+                networks=(),
+                allowed_list=["localhost (127.0.0.1,::1)"],
+                connect_timeout=2.5,
+            )
+        ),
+    ],
+)
+def test_policy_round_trip(policy):
+    assert _load_policy(_dump_policy(policy)) == policy
+
+
+def test_policy_round_trip_with_networks():
+    from ipaddress import ip_network
+
+    policy = _Policy(
+        block_sockets=True,
+        allowed_hosts=_AllowedHosts(
+            hosts=frozenset(),
+            networks=(ip_network("10.0.0.0/8"), ip_network("fd00::/8")),
+            allowed_list=["10.0.0.0/8", "fd00::/8"],
+            allow_unix_socket=True,
+        ),
+    )
+    assert _load_policy(_dump_policy(policy)) == policy
+
+
+def test_policy_round_trip_with_ports():
+    policy = _Policy(
+        allowed_hosts=_compile_allowed_hosts(
+            ["127.0.0.1:5432", "[::1]:8000-8099", "10.0.0.0/8:443"], False, None, None
+        )
+    )
+    assert _load_policy(_dump_policy(policy)) == policy
+
+
+def test_unix_socket_paths_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = _UnixSocketPaths(["app.sock", "/run/app/", "/tmp/pytest-*", "@my-app"])
+    raw = _dump_policy(_Policy(block_sockets=True, allow_unix_socket=True), paths)
+    loaded = _UnixSocketPaths.load(raw.splitlines()[2])
+    monkeypatch.chdir("/")
+    assert loaded.allows(str(tmp_path / "app.sock"))
+    assert loaded.allows("/run/app/x.sock")
+    assert loaded.allows("/tmp/pytest-1/x.sock")
+    assert loaded.allows(b"\0my-app")
+    assert not loaded.allows("/run/docker.sock")
+    assert loaded.allowed_list == paths.allowed_list
+
+
+def test_large_policy_exported_through_file(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYTEST_SOCKET_POLICY", raising=False)
+    policy = _Policy(
+        allowed_hosts=_compile_allowed_hosts(
+            [f"10.{i // 256}.{i % 256}.1" for i in range(8000)], False, None, None
+        )
+    )
+    path = str(tmp_path / "policy")
+    _export_policy(policy, path)
+    assert os.environ["PYTEST_SOCKET_POLICY"] == path
+    with open(path, encoding="utf-8") as f:
+        assert _load_policy(f.read()) == policy
+    _export_policy(_Policy(), path)
+    assert "PYTEST_SOCKET_POLICY" not in os.environ
+
+
+@requires_startup_hook
+def test_subprocess_inherits_disabled_socket(pytester):
+    pytester.makepyfile(CHILD_CODE + """
+    def test_child_blocked():
+        result = run_child("import socket; socket.socket()")
+        assert result.returncode != 0
+        assert "SocketBlockedError: A test tried to use socket.socket." in (
+            result.stderr
+        )
+
+    def test_child_dns_blocked():
+        result = run_child("import socket; socket.getaddrinfo('localhost', 80)")
+        assert "A test tried to use socket.getaddrinfo." in result.stderr
+    """)
+    result = pytester.runpytest("--disable-socket", "--socket-propagate")
+    result.assert_outcomes(passed=2)
+
+
+@requires_startup_hook
+def test_subprocess_unrestricted_without_propagation(pytester):
+    pytester.makepyfile(CHILD_CODE + """
+    def test_child_unrestricted():
+        result = run_child("import socket; socket.socket().close()")
+        assert result.returncode == 0, result.stderr
+    """)
+    result = pytester.runpytest("--disable-socket")
+    result.assert_outcomes(passed=1)
+
+
+@requires_startup_hook
+def test_subprocess_inherits_allowed_hosts(pytester, httpserver):
+    pytester.makepyfile(CHILD_CODE + f"""
+    import pytest
+
+    CONNECT = "import socket; socket.create_connection(({{!r}}, {httpserver.port}))"
+
+    @pytest.mark.allow_hosts(["{httpserver.host}"])
+    def test_child_allowed():
+        result = run_child(CONNECT.format("{httpserver.host}"))
+        assert result.returncode == 0, result.stderr
+
+    @pytest.mark.allow_hosts(["{httpserver.host}"])
+    def test_child_blocked():
+        result = run_child(CONNECT.format("2.2.2.2"))
+        assert 'with host "2.2.2.2"' in result.stderr
+
+    def test_child_unrestricted_after_policy_lifted():
+        result = run_child(CONNECT.format("{httpserver.host}"))
+        assert result.returncode == 0, result.stderr
+    """)
+    result = pytester.runpytest("--socket-propagate", "-p", "no:randomly")
+    result.assert_outcomes(passed=3)
+
+
+@unix_sockets_only
+@requires_startup_hook
+def test_subprocess_inherits_unix_socket_paths(pytester, tmp_path):
+    allowed = tmp_path / "allowed.sock"
+    pytester.makepyfile(CHILD_CODE + f"""
+    CONNECT = (
+        "import socket; "
+        "socket.socket(socket.AF_UNIX, socket.SOCK_STREAM).connect({{!r}})"
+    )
+
+    def test_child_allowed_path():
+        result = run_child(CONNECT.format("{allowed}"))
+        assert "FileNotFoundError" in result.stderr, result.stderr
+
+    def test_child_blocked_path():
+        result = run_child(CONNECT.format("/run/docker.sock"))
+        assert "SocketConnectBlockedError" in result.stderr, result.stderr
+    """)
+    result = pytester.runpytest(
+        "--disable-socket",
+        f"--allow-unix-socket-paths={allowed}",
+        "--socket-propagate",
+    )
+    result.assert_outcomes(passed=2)
+
+
+@requires_startup_hook
+def test_spawned_multiprocessing_worker_inherits_policy(pytester):
+    pytester.makepyfile("""
+        import multiprocessing
+        import socket
+
+        import pytest
+        from pytest_socket import SocketBlockedError
+
+        def open_inet_socket():
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM).close()
+
+        def test_worker_blocked():
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(1) as pool:
+                with pytest.raises(SocketBlockedError):
+                    pool.apply(open_inet_socket)
+        """)
+    result = pytester.runpytest(
+        "--disable-socket", "--allow-unix-socket", "--socket-propagate"
+    )
+    result.assert_outcomes(passed=1)
@@ -0,0 +1,316 @@
+"""Tests for socket policies and network calls across threads."""
+
+import pickle
+import socket
+import threading
+
+import pytest
+
+from pytest_socket import (
+    SocketBlockedError,
+    SocketConnectBlockedError,
+    _remove_restrictions,
+    disable_socket,
+    enable_socket,
+    socket_allow_hosts,
+)
+
+RUNAWAY_THREAD_PYFILE = """
+    import socket
+    import threading
+
+    import pytest
+
+    go = threading.Event()
+    threads = []
+
+    def heartbeat():
+        go.wait()
+        socket.socket().close()
+
+    def test_starts_thread():
+        thread = threading.Thread(target=heartbeat, name="heartbeat")
+        thread.start()
+        threads.append(thread)
+
+    def test_unrelated():
+        go.set()
+        threads[0].join()
+    """
+
+
+def test_help_message(pytester):
+    result = pytester.runpytest("--help")
+    result.stdout.fnmatch_lines(
+        [
+            "socket:",
+            "*--socket-track-threads",
+            "*Flag network calls made by threads that outlive the test*",
+        ]
+    )
+
+
+def test_runaway_thread_flagged(pytester):
+    pytester.makepyfile(RUNAWAY_THREAD_PYFILE)
+    result = pytester.runpytest(
+        "--socket-track-threads", "-W", "always::UserWarning", "-p", "no:randomly"
+    )
+    result.assert_outcomes(passed=2, warnings=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*test_unrelated*",
+            '*Thread "heartbeat" started by finished test '
+            '"test_runaway_thread_flagged.py::test_starts_thread" '
+            "made a network call (socket.__new__).",
+            "*pytest-socket runaway threads*",
+            'thread "heartbeat" started by '
+            "test_runaway_thread_flagged.py::test_starts_thread: 1 network call(s)",
+        ]
+    )
+
+
+def test_runaway_thread_not_flagged_by_default(pytester):
+    pytester.makepyfile(RUNAWAY_THREAD_PYFILE)
+    result = pytester.runpytest("-W", "always::UserWarning", "-p", "no:randomly")
+    result.assert_outcomes(passed=2)
+    result.stdout.no_fnmatch_line("*started by*")
+
+
+def test_thread_from_session_fixture_not_flagged(pytester):
+    pytester.makepyfile("""
+        import socket
+        import threading
+
+        import pytest
+
+        go = threading.Event()
+
+        def server():
+            go.wait()
+            socket.socket().close()
+
+        @pytest.fixture(scope="session")
+        def background():
+            thread = threading.Thread(target=server)
+            thread.start()
+            yield thread
+            thread.join()
+
+        def test_first(background):
+            pass
+
+        def test_second(background):
+            go.set()
+            background.join()
+        """)
+    result = pytester.runpytest(
+        "--socket-track-threads", "-W", "error::UserWarning", "-p", "no:randomly"
+    )
+    result.assert_outcomes(passed=2)
+
+
+def test_blocked_error_records_originating_thread(pytester):
+    pytester.makepyfile("""
+        import socket
+        import threading
+
+        import pytest
+        from pytest_socket import SocketBlockedError
+
+        def test_blocked_in_thread():
+            errors = []
+
+            def worker():
+                try:
+                    socket.socket()
+                except SocketBlockedError as exc:
+                    errors.append(exc)
+
+            thread = threading.Thread(target=worker, name="worker")
+            thread.start()
+            thread.join()
+            assert errors[0].origin == 'thread "worker"'
+            raise errors[0]
+        """)
+    result = pytester.runpytest("--disable-socket")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        '*SocketBlockedError: A test tried to use socket.socket. (from thread "worker")'
+    )
+
+
+def test_main_thread_has_no_origin():
+    with pytest.warns(UserWarning):
+        exc = SocketBlockedError()
+    assert exc.origin is None
+    assert str(exc) == "A test tried to use socket.socket."
+
+
+@pytest.mark.parametrize(
+    "factory",
+    [
+        lambda: SocketBlockedError(),
+        lambda: SocketConnectBlockedError(["127.0.0.1"], "2.2.2.2"),
+    ],
+)
+def test_origin_survives_pickling(factory):
+    excs = []
+    thread = threading.Thread(target=lambda: excs.append(factory()), name="worker")
+    with pytest.warns(UserWarning):
+        thread.start()
+        thread.join()
+        restored = pickle.loads(pickle.dumps(excs[0]))
+    assert restored.origin == 'thread "worker"'
+    assert restored.args == excs[0].args
+
+
+def test_concurrent_tests_keep_their_own_policy(pytester, httpserver):
+    """Tests run concurrently in threads, as thread-parallel runners do,
+    must not see each other's `enable_socket()` or `disable_socket()`."""
+    pytester.makepyfile(f"""
+        import socket
+        import threading
+
+        import pytest
+        import pytest_socket
+
+        def run_concurrently(*bodies):
+            barrier = threading.Barrier(len(bodies))
+            outcomes = {{}}
+
+            def run(body):
+                try:
+                    body(barrier)
+                    outcomes[body.__name__] = "passed"
+                except Exception as exc:
+                    outcomes[body.__name__] = type(exc).__name__
+                finally:
+                    pytest_socket._remove_restrictions()
+
+            threads = [threading.Thread(target=run, args=(b,)) for b in bodies]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return outcomes
+
+        def disabled(barrier):
+            pytest_socket.disable_socket()
+            barrier.wait()
+            barrier.wait()
+            socket.socket()
+
+        def enabled(barrier):
+            barrier.wait()
+            pytest_socket.enable_socket()
+            socket.socket().close()
+            barrier.wait()
+
+        def restricted(barrier):
+            pytest_socket.socket_allow_hosts(["1.2.3.4"])
+            barrier.wait()
+            barrier.wait()
+            socket.create_connection(("{httpserver.host}", {httpserver.port}))
+
+        def test_isolated():
+            outcomes = run_concurrently(disabled, enabled, restricted)
+            assert outcomes == {{
+                "disabled": "SocketBlockedError",
+                "enabled": "passed",
+                "restricted": "SocketConnectBlockedError",
+            }}
+            # The session thread's own policy is untouched.
+            socket.socket().close()
+        """)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1)
+
+
+def test_threads_started_by_a_test_follow_its_policy(pytester):
+    """Threads started from the session thread, e.g. a client's background
+    thread, are covered by the policy of the test that started them."""
+    pytester.makepyfile("""
+        import socket
+        import threading
+
+        def test_background_thread_blocked():
+            errors = []
+
+            def worker():
+                try:
+                    socket.socket()
+                except Exception as exc:
+                    errors.append(type(exc).__name__)
+
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+            assert errors == ["SocketBlockedError"]
+        """)
+    result = pytester.runpytest("--disable-socket")
+    result.assert_outcomes(passed=1)
+
+
+def test_policy_set_in_thread_stays_in_thread():
+    results = []
+
+    def worker():
+        disable_socket()
+        try:
+            socket.socket()
+        except SocketBlockedError:
+            results.append("blocked")
+        finally:
+            enable_socket()
+
+    thread = threading.Thread(target=worker)
+    with pytest.warns(UserWarning):
+        thread.start()
+        thread.join()
+    assert results == ["blocked"]
+    socket.socket().close()
+
+
+def test_thread_policy_outlives_session_thread_change():
+    """Lifting the session thread's restrictions leaves the guards in place
+    for a thread still restricted by a policy of its own."""
+    original = socket.socket
+    disabled = threading.Event()
+    enabled = threading.Event()
+    results = []
+
+    def worker():
+        disable_socket()
+        disabled.set()
+        enabled.wait()
+        try:
+            socket.socket()
+        except SocketBlockedError:
+            results.append("blocked")
+        finally:
+            enable_socket()
+
+    thread = threading.Thread(target=worker)
+    with pytest.warns(UserWarning):
+        thread.start()
+        disabled.wait()
+        disable_socket()
+        enable_socket()
+        enabled.set()
+        thread.join()
+    assert results == ["blocked"]
+    enable_socket()
+    assert socket.socket is original
+
+
+def test_guards_restored_when_policy_lifted():
+    """Lifting every restriction puts the original `socket` objects back."""
+    original = (socket.socket, socket.socket.connect, socket.getaddrinfo)
+    disable_socket()
+    socket_allow_hosts(["127.0.0.1"])
+    assert socket.socket is not original[0]
+    enable_socket()
+    assert socket.socket is original[0]
+    assert socket.getaddrinfo is original[2]
+    _remove_restrictions()
+    assert (socket.socket, socket.socket.connect, socket.getaddrinfo) == original